@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Deterministic benchmark harness for the Discord bot's command callbacks.
+
+Drives the real `bot/bot.py` command callbacks against fake Discord contexts,
+an in-memory Supabase stand-in and a fake OpenAI client with configurable
+latency, then reports throughput, p50/p95/p99 latency and backend calls per
+command.
+
+Examples:
+    python bench/bench_bot.py                                  # 1k users, 1 year of history
+    python bench/bench_bot.py --users 1000000 --days 1825      # 1M users, 5 years
+    python bench/bench_bot.py --db-latency 20 --ai-latency 800 --concurrency 8
+    python bench/bench_bot.py --commands reflect --ai-model-latency gpt-4o-mini=12000
+    python bench/bench_bot.py --commands checkin summary --json bench.json
+    python bench/bench_bot.py --backend memory                 # zero-I/O storage baseline
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'bot'))
+
+from fakes import (SyntheticPopulation, FakeSupabase, SyntheticMemoryBackend, CountingBackend,
+                   FakeOpenAI, FakeAuthor, FakeContext, FakeAttachment)
+
+ALL_COMMANDS = ['checkin', 'summary', 'history', 'moodtrend', 'calendar', 'export', 'import',
+                'leaderboard_refresh', 'leaderboard', 'stats', 'reflect', 'rewrite', 'idea', 'reminder_tick']
+TICK_COMMANDS = {'reminder_tick', 'leaderboard_refresh'}
+BENCH_GUILD_ID = '1'
+AI_COMMANDS = {'reflect', 'rewrite', 'idea'}
+
+
+def load_bot(storage, ai: FakeOpenAI):
+    """Import bot.py wired to the local stand-ins instead of real services"""
+    # Pin the environment before bot.py runs load_dotenv(), which never overrides
+    os.environ['USE_LOCAL_ONLY'] = 'false'
+    os.environ['STORAGE_BACKEND'] = 'memory'
+    os.environ['SUPABASE_URL'] = ''
+    os.environ['SUPABASE_SERVICE_ROLE'] = ''
+    os.environ['OPENAI_API_KEY'] = 'bench'
+
+    import bot as habit_bot
+
+    habit_bot.tracker.storage = storage
+    habit_bot.openai_client = ai
+
+    async def wait_for(event, timeout=None, check=None):
+        # Benchmark users never answer confirmation prompts
+        raise asyncio.TimeoutError()
+
+    async def fetch_user(user_id):
+        return FakeAuthor(str(user_id))
+
+    habit_bot.bot.wait_for = wait_for
+    habit_bot.bot.fetch_user = fetch_user
+    return habit_bot
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.population = SyntheticPopulation(
+            users=args.users,
+            history_days=args.days,
+            checkin_rate=args.checkin_rate,
+            reminder_ratio=args.reminder_ratio,
+            seed=args.seed,
+        )
+        self.ai = FakeOpenAI(latency=args.ai_latency / 1000,
+                             model_latency={m: ms / 1000 for m, ms in args.ai_model_latency})
+
+        if args.backend == 'memory':
+            # Count storage engine calls, there is no client underneath
+            self.db = CountingBackend(SyntheticMemoryBackend(self.population))
+            storage = self.db
+        else:
+            # Count raw client calls, i.e. PostgREST round trips
+            from storage import SupabaseBackend, MemoryBackend
+            self.db = FakeSupabase(self.population, latency=args.db_latency / 1000)
+            storage = SupabaseBackend(self.db, fallback=MemoryBackend())
+
+        self.habit_bot = load_bot(storage, self.ai)
+
+    def _random_context(self) -> FakeContext:
+        discord_id = self.population.discord_id(self.rng.randrange(self.population.users))
+        return FakeContext(FakeAuthor(discord_id))
+
+    def _import_file(self) -> FakeAttachment:
+        """A CSV with --days of history, as exported by another habit app"""
+        today = date.today()
+        lines = ["date,mood,message"]
+        for offset in range(1, self.args.days + 1):
+            lines.append(f"{(today - timedelta(days=offset)).isoformat()},{self.rng.randint(1, 5)},imported day {offset}")
+        return FakeAttachment('history.csv', "\n".join(lines).encode('utf-8'))
+
+    def _operation(self, command: str):
+        """Build one zero-argument coroutine factory for `command`"""
+        bot_module = self.habit_bot
+        if command == 'reminder_tick':
+            return lambda: bot_module.daily_reminder_check.coro()
+        if command == 'leaderboard_refresh':
+            return lambda: bot_module.rebuild_leaderboards([BENCH_GUILD_ID])
+
+        if command == 'import':
+            # Fresh users outside the synthetic population, like someone migrating in
+            self.import_users = getattr(self, 'import_users', 0) + 1
+            ctx = FakeContext(FakeAuthor(str(10 ** 16 + self.import_users)), attachments=[self._import_file()])
+            return lambda: bot_module.import_history.callback(ctx)
+
+        ctx = self._random_context()
+        if command == 'checkin':
+            mood = self.rng.randint(1, 5)
+            return lambda: bot_module.checkin.callback(ctx, str(mood), message="benchmark check-in")
+        if command == 'rewrite':
+            return lambda: bot_module.rewrite.callback(ctx, text="I'm such a failure, missed 3 days in a row")
+        if command == 'stats':
+            return lambda: bot_module.community_stats.callback(ctx, 30)
+        return lambda: getattr(bot_module, command).callback(ctx)
+
+    async def run_command(self, command: str, iterations: int) -> dict:
+        operations = [self._operation(command) for _ in range(iterations)]
+        latencies = []
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def timed(operation):
+            async with semaphore:
+                start = time.perf_counter()
+                await operation()
+                latencies.append(time.perf_counter() - start)
+
+        db_before = sum(self.db.calls.values())
+        ai_before = sum(self.ai.calls.values())
+        breakdown_before = Counter(self.db.calls)
+        ai_breakdown_before = Counter(self.ai.calls)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(timed(op) for op in operations))
+        wall = time.perf_counter() - wall_start
+
+        latencies.sort()
+        breakdown = Counter(self.db.calls)
+        breakdown.subtract(breakdown_before)
+        ai_breakdown = Counter(self.ai.calls)
+        ai_breakdown.subtract(ai_breakdown_before)
+        return {
+            'command': command,
+            'iterations': iterations,
+            'throughput_per_s': iterations / wall if wall else float('inf'),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'backend_calls_per_op': (sum(self.db.calls.values()) - db_before) / iterations,
+            'ai_calls_per_op': (sum(self.ai.calls.values()) - ai_before) / iterations,
+            'backend_breakdown': {k: v / iterations for k, v in sorted(breakdown.items()) if v},
+            'ai_breakdown': {k: v / iterations for k, v in sorted(ai_breakdown.items()) if v},
+        }
+
+    async def seed_guild(self):
+        """Put the first --guild-members users of the population in the benchmark server"""
+        if getattr(self, 'guild_seeded', False):
+            return
+        self.guild_seeded = True
+        storage = self.habit_bot.tracker.storage
+        for index in range(min(self.args.guild_members, self.population.users)):
+            discord_id = self.population.discord_id(index)
+            await storage.get_or_create_user(discord_id, f"user{index}")
+            await storage.add_guild_member(BENCH_GUILD_ID, discord_id)
+        await self.habit_bot.rebuild_leaderboards([BENCH_GUILD_ID])
+
+    async def run(self) -> list:
+        results = []
+        for command in self.args.commands:
+            if command.startswith('leaderboard'):
+                await self.seed_guild()
+            iterations = self.args.tick_iterations if command in TICK_COMMANDS else self.args.iterations
+            if self.args.warmup and command not in TICK_COMMANDS:
+                await self.run_command(command, min(self.args.warmup, iterations))
+            results.append(await self.run_command(command, iterations))
+        return results
+
+
+def print_report(args, results: list):
+    print(f"\n📊 Benchmark ({args.backend}): {args.users:,} users, {args.days} days of history, "
+          f"db latency {args.db_latency}ms, AI latency {args.ai_latency}ms, concurrency {args.concurrency}\n")
+    header = f"{'command':<21}{'ops':>7}{'ops/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/op':>9}{'ai/op':>8}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['command']:<21}{r['iterations']:>7}{r['throughput_per_s']:>11.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['backend_calls_per_op']:>9.2f}{r['ai_calls_per_op']:>8.2f}")
+    print()
+    for r in results:
+        calls = ', '.join(f"{k}={v:.2f}" for k, v in r['backend_breakdown'].items()) or 'none'
+        print(f"  {r['command']}: {calls}")
+        if r['ai_breakdown']:
+            models = ', '.join(f"{k}={v:.2f}" for k, v in r['ai_breakdown'].items())
+            print(f"  {r['command']} (AI): {models}")
+
+
+def parse_model_latency(value: str) -> tuple:
+    model, _, ms = value.partition('=')
+    try:
+        return model, float(ms)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected MODEL=MS, got {value!r}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HabitualAI bot commands against local stand-ins")
+    parser.add_argument('--users', type=int, default=1000, help="synthetic population size")
+    parser.add_argument('--days', type=int, default=365, help="days of history per user")
+    parser.add_argument('--checkin-rate', type=float, default=0.8, help="chance a user checked in on a given day")
+    parser.add_argument('--reminder-ratio', type=float, default=0.05, help="share of users with a reminder set")
+    parser.add_argument('--iterations', type=int, default=200, help="operations per command")
+    parser.add_argument('--tick-iterations', type=int, default=3, help="reminder ticks / leaderboard rebuilds to run")
+    parser.add_argument('--guild-members', type=int, default=1000, help="users in the benchmark server")
+    parser.add_argument('--warmup', type=int, default=10, help="untimed operations before each command")
+    parser.add_argument('--concurrency', type=int, default=1, help="concurrent operations in flight")
+    parser.add_argument('--backend', choices=['supabase', 'memory'], default='supabase',
+                        help="fake Supabase client behind SupabaseBackend, or the in-memory engine")
+    parser.add_argument('--db-latency', type=float, default=0.0, help="simulated ms per backend call")
+    parser.add_argument('--ai-latency', type=float, default=0.0, help="simulated ms per OpenAI call")
+    parser.add_argument('--ai-model-latency', type=parse_model_latency, action='append', default=[],
+                        metavar='MODEL=MS', help="simulated ms per call for one model, overrides --ai-latency")
+    parser.add_argument('--commands', nargs='+', choices=ALL_COMMANDS, default=ALL_COMMANDS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help="also write results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Keep any local fallback files (checkins.json etc.) out of the working tree
+    workdir = tempfile.mkdtemp(prefix='habitual-bench-')
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    os.chdir(workdir)
+
+    bench = Bench(args)
+    # Command output is noise here, the bot prints on every reminder and error
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results = asyncio.run(bench.run())
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print_report(args, results)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"\n💾 Wrote {json_path}")
+
+
+if __name__ == '__main__':
+    main()
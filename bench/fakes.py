@@ -0,0 +1,619 @@
+"""
+Local stand-ins for the services the bot talks to, used by the benchmark harness.
+
+- FakeSupabase speaks the small slice of the supabase-py query builder the bot
+  uses (table/select/eq/order/.../execute and rpc) against in-memory tables.
+- SyntheticPopulation generates users and years of check-in history lazily and
+  deterministically, so a 1M user population only costs memory for the users a
+  benchmark actually touches.
+- SyntheticMemoryBackend is the bot's MemoryBackend backed by the same
+  synthetic population, for a zero-I/O baseline.
+- CountingBackend wraps any storage engine and counts calls per method.
+- FakeOpenAI mimics `openai.OpenAI(...).chat.completions.create` with a
+  configurable (blocking, like the real client) latency.
+- FakeContext / FakeAuthor / FakeMessage stand in for discord.py objects.
+"""
+
+import time
+import uuid
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+from storage import MemoryBackend
+
+
+MAX_ROWS = 1000  # PostgREST's default db-max-rows, selects never return more
+
+SAMPLE_MESSAGES = [
+    None,
+    "went for a walk",
+    "rough day but showed up",
+    "read 10 pages",
+    "meditated for 5 minutes",
+    "slept badly, still here",
+    "cooked dinner instead of ordering",
+]
+
+
+class SyntheticPopulation:
+    """Deterministic synthetic users with `history_days` of check-in history each"""
+
+    BASE_DISCORD_ID = 10 ** 17
+
+    def __init__(self, users: int, history_days: int, checkin_rate: float = 0.8,
+                 reminder_ratio: float = 0.05, seed: int = 42):
+        self.users = users
+        self.history_days = history_days
+        self.checkin_rate = checkin_rate
+        self.reminder_ratio = reminder_ratio
+        self.seed = seed
+
+    def discord_id(self, index: int) -> str:
+        return str(self.BASE_DISCORD_ID + index)
+
+    def index_of(self, discord_id: str) -> Optional[int]:
+        try:
+            index = int(discord_id) - self.BASE_DISCORD_ID
+        except (TypeError, ValueError):
+            return None
+        return index if 0 <= index < self.users else None
+
+    def has_reminder(self, index: int) -> bool:
+        return random.Random(f"{self.seed}:reminder:{index}").random() < self.reminder_ratio
+
+    def reminder_indexes(self):
+        return (i for i in range(self.users) if self.has_reminder(i))
+
+    def user_row(self, index: int, reminder_time: str) -> dict:
+        return {
+            'id': str(uuid.UUID(int=index + 1)),
+            'discord_id': self.discord_id(index),
+            'discord_username': f"user{index}#0001",
+            'reminder_time': reminder_time if self.has_reminder(index) else None,
+            'timezone': 'UTC',
+            'created_at': datetime(2020, 1, 1).isoformat(),
+            'updated_at': datetime(2020, 1, 1).isoformat(),
+        }
+
+    def checkin_rows(self, index: int, user_id: str) -> list:
+        """History ending yesterday, so benchmarked check-ins for today are new"""
+        rng = random.Random(f"{self.seed}:history:{index}")
+        yesterday = date.today() - timedelta(days=1)
+        rows = []
+        for offset in range(self.history_days):
+            if rng.random() >= self.checkin_rate:
+                continue
+            day = yesterday - timedelta(days=offset)
+            rows.append({
+                'id': str(uuid.UUID(int=(index + 1) << 32 | offset)),
+                'user_id': user_id,
+                'date': day.isoformat(),
+                'message': rng.choice(SAMPLE_MESSAGES),
+                'mood': rng.randint(1, 5),
+                'created_at': datetime.combine(day, datetime.min.time()).isoformat(),
+            })
+        return rows
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable query builder mirroring the postgrest-py request builders"""
+
+    def __init__(self, db: 'FakeSupabase', table: str):
+        self.db = db
+        self.table_name = table
+        self.action = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.limit_count = None
+        self._negate_next = False
+        self.ignore_duplicates = False
+
+    # Actions
+    def select(self, columns: str = '*', **kwargs):
+        self.action = 'select'
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.action = 'insert'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, ignore_duplicates: bool = False, **kwargs):
+        self.action = 'upsert'
+        self.payload = payload
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self.action = 'update'
+        self.payload = payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # Filters
+    @property
+    def not_(self):
+        self._negate_next = True
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value, self._negate_next))
+        self._negate_next = False
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, list(values))
+
+    def is_(self, column, value):
+        return self._filter('is', column, value)
+
+    def order(self, column, desc: bool = False, **kwargs):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int, **kwargs):
+        self.limit_count = count
+        return self
+
+    def execute(self) -> FakeResponse:
+        self.db._charge(f"{self.table_name}.{self.action}")
+        return FakeResponse(getattr(self, f"_run_{self.action}")())
+
+    # Execution
+    def _matches(self, row) -> bool:
+        for op, column, value, negate in self.filters:
+            current = row.get(column)
+            if op == 'eq':
+                ok = current == value
+            elif op == 'neq':
+                ok = current != value
+            elif op == 'in':
+                ok = current in value
+            elif op == 'is':
+                ok = current is None if value in (None, 'null') else current == value
+            elif current is None:
+                ok = False
+            elif op == 'lt':
+                ok = current < value
+            elif op == 'lte':
+                ok = current <= value
+            elif op == 'gt':
+                ok = current > value
+            else:
+                ok = current >= value
+            if ok == negate:
+                return False
+        return True
+
+    def _eq_value(self, column):
+        return next((v for op, c, v, neg in self.filters if op == 'eq' and c == column and not neg), None)
+
+    def _candidates(self):
+        # Use the same access paths the real indexes give us
+        if self.table_name == 'users':
+            discord_id = self._eq_value('discord_id')
+            if discord_id is not None:
+                user = self.db.get_user(discord_id)
+                return [user] if user else []
+            return list(self.db.users.values())
+        if self.table_name != 'checkins':
+            return list(self.db.tables.get(self.table_name, {}).values())
+        user_id = self._eq_value('user_id')
+        if user_id is not None:
+            return list(self.db.checkins_for(user_id).values())
+        return [row for rows in self.db.checkins.values() for row in rows.values()]
+
+    def _project(self, row):
+        if self.columns.strip() == '*':
+            return dict(row)
+        return {c.strip(): row.get(c.strip()) for c in self.columns.split(',')}
+
+    def _run_select(self):
+        rows = [row for row in self._candidates() if self._matches(row)]
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        limit = MAX_ROWS if self.limit_count is None else min(self.limit_count, MAX_ROWS)
+        return [self._project(row) for row in rows[:limit]]
+
+    def _run_insert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        return [self.db.insert_row(self.table_name, dict(row)) for row in payload]
+
+    def _run_upsert(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        return [self.db.insert_row(self.table_name, dict(row), replace=not self.ignore_duplicates)
+                for row in payload]
+
+    def _run_update(self):
+        rows = [row for row in self._candidates() if self._matches(row)]
+        for row in rows:
+            row.update(self.payload)
+        return [dict(row) for row in rows]
+
+    def _run_delete(self):
+        rows = [row for row in self._candidates() if self._matches(row)]
+        for row in rows:
+            self.db.delete_row(self.table_name, row)
+        return [dict(row) for row in rows]
+
+
+class FakeRPC:
+    def __init__(self, db: 'FakeSupabase', fn: str, params: dict):
+        self.db = db
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.db._charge(f"rpc.{self.fn}")
+        handler = getattr(self.db, f"_rpc_{self.fn}", None)
+        if handler is None:
+            raise RuntimeError(f"Could not find the function public.{self.fn}")
+        return FakeResponse(handler(**self.params))
+
+
+class FakeSupabase:
+    """In-memory stand-in for `supabase.Client` with per-call accounting"""
+
+    def __init__(self, population: Optional[SyntheticPopulation] = None, latency: float = 0.0,
+                 reminder_time: Optional[str] = None):
+        self.population = population
+        self.latency = latency
+        self.reminder_time = reminder_time or datetime.utcnow().time().replace(microsecond=0).isoformat()
+        self.users = {}        # discord_id -> row
+        self.users_by_id = {}  # id -> row
+        self.checkins = {}     # user_id -> {date: row}
+        self.tables = {}       # any other table -> {primary key: row}
+        self.calls = Counter()
+
+        if population:
+            # Reminder users have to exist up front so reminder ticks can scan them
+            for index in population.reminder_indexes():
+                self._store_user(population.user_row(index, self.reminder_time))
+
+    def _charge(self, key: str):
+        self.calls[key] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # Storage primitives
+    def _store_user(self, row: dict) -> dict:
+        self.users[row['discord_id']] = row
+        self.users_by_id[row['id']] = row
+        return row
+
+    def get_user(self, discord_id: str) -> Optional[dict]:
+        user = self.users.get(discord_id)
+        if user is None and self.population:
+            index = self.population.index_of(discord_id)
+            if index is not None:
+                user = self._store_user(self.population.user_row(index, self.reminder_time))
+        return user
+
+    def checkins_for(self, user_id: str) -> dict:
+        rows = self.checkins.get(user_id)
+        if rows is None:
+            rows = {}
+            user = self.users_by_id.get(user_id)
+            if user and self.population:
+                index = self.population.index_of(user['discord_id'])
+                if index is not None:
+                    rows = {r['date']: r for r in self.population.checkin_rows(index, user_id)}
+            self.checkins[user_id] = rows
+        return rows
+
+    PRIMARY_KEYS = {'guild_members': ('guild_id', 'discord_id'), 'daily_rollups': ('date',)}
+
+    def insert_row(self, table: str, row: dict, replace: bool = True) -> dict:
+        if table not in ('users', 'checkins'):
+            rows = self.tables.setdefault(table, {})
+            key = tuple(row.get(c) for c in self.PRIMARY_KEYS.get(table, ('id',)))
+            if replace or key not in rows:
+                rows[key] = row
+            return dict(rows[key])
+        if table == 'users':
+            row.setdefault('id', str(uuid.uuid4()))
+            row.setdefault('reminder_time', None)
+            row.setdefault('timezone', 'UTC')
+            return dict(self._store_user(row))
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', datetime.now().isoformat())
+        self.checkins_for(row['user_id'])[row['date']] = row
+        return dict(row)
+
+    def delete_row(self, table: str, row: dict):
+        if table == 'users':
+            self.users.pop(row['discord_id'], None)
+            self.users_by_id.pop(row['id'], None)
+            self.checkins.pop(row['id'], None)
+        elif table == 'checkins':
+            self.checkins_for(row['user_id']).pop(row['date'], None)
+        else:
+            rows = self.tables.get(table, {})
+            for key in [k for k, v in rows.items() if v is row]:
+                del rows[key]
+
+    # Client interface
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: dict) -> FakeRPC:
+        return FakeRPC(self, fn, params)
+
+    # RPC implementations (mirroring supabase_schema.sql)
+    def _rpc_create_user_if_not_exists(self, p_discord_id, p_discord_username=None):
+        user = self.get_user(p_discord_id)
+        if user is None:
+            user = self.insert_row('users', {'discord_id': p_discord_id, 'discord_username': p_discord_username})
+        return dict(user)
+
+    def _rollup(self, day: str) -> dict:
+        rows = self.tables.setdefault('daily_rollups', {})
+        if (day,) not in rows:
+            rows[(day,)] = {'date': day, 'checkins': 0, 'mood_sum': 0, 'mood_histogram': [0] * 5,
+                            'reminder_checkins': 0, 'reminders_sent': 0}
+        return rows[(day,)]
+
+    def _adjust_rollup(self, row: dict, sign: int):
+        # What the checkins_daily_rollups trigger does; synthetic history isn't counted
+        rollup = self._rollup(row['date'])
+        rollup['checkins'] += sign
+        if row.get('mood'):
+            rollup['mood_sum'] += sign * row['mood']
+            rollup['mood_histogram'][row['mood'] - 1] += sign
+        if row.get('reminded'):
+            rollup['reminder_checkins'] += sign
+
+    def _rpc_create_or_update_checkin(self, p_user_discord_id, p_date, p_message=None, p_mood=None,
+                                      p_reminded=False):
+        user = self._rpc_create_user_if_not_exists(p_user_discord_id)
+        rows = self.checkins_for(user['id'])
+        row = rows.get(p_date)
+        if row is None:
+            row = self.insert_row('checkins', {
+                'user_id': user['id'], 'date': p_date, 'message': p_message, 'mood': p_mood, 'reminded': p_reminded
+            })
+            self._adjust_rollup(row, 1)
+            return row
+        self._adjust_rollup(row, -1)
+        row.update({'message': p_message, 'mood': p_mood, 'reminded': row.get('reminded') or p_reminded,
+                    'created_at': datetime.now().isoformat()})
+        self._adjust_rollup(row, 1)
+        return dict(row)
+
+    def _rpc_record_reminders_sent(self, p_date, p_count):
+        self._rollup(p_date)['reminders_sent'] += p_count
+        return None
+
+    def _rpc_get_checkin_day_ordinals(self, p_discord_ids):
+        result = []
+        for discord_id in p_discord_ids:
+            user = self.get_user(discord_id)
+            rows = self.checkins_for(user['id']) if user else {}
+            if rows:
+                result.append({'discord_id': discord_id,
+                               'days': sorted(date.fromisoformat(d).toordinal() for d in rows)})
+        return result
+
+    def _rpc_bulk_upsert_checkins(self, p_user_discord_id, p_checkins, p_overwrite=False):
+        user = self._rpc_create_user_if_not_exists(p_user_discord_id)
+        rows = self.checkins_for(user['id'])
+        affected = 0
+        for checkin in p_checkins:
+            row = rows.get(checkin['date'])
+            if row is None:
+                self._adjust_rollup(self.insert_row('checkins', dict(checkin, user_id=user['id'])), 1)
+            elif p_overwrite:
+                self._adjust_rollup(row, -1)
+                row.update({'message': checkin.get('message'), 'mood': checkin.get('mood')})
+                self._adjust_rollup(row, 1)
+            else:
+                continue
+            affected += 1
+        return affected
+
+
+class SyntheticMemoryBackend(MemoryBackend):
+    """MemoryBackend whose users and history come lazily from a SyntheticPopulation"""
+
+    def __init__(self, population: SyntheticPopulation, reminder_time: Optional[str] = None):
+        super().__init__()
+        self.population = population
+        self.reminder_time = reminder_time or datetime.utcnow().time().replace(microsecond=0).isoformat()
+        for index in population.reminder_indexes():
+            self._materialize(population.discord_id(index))
+
+    def _materialize(self, discord_id: str) -> Optional[dict]:
+        user = self.users.get(discord_id)
+        index = self.population.index_of(discord_id)
+        if user is None and index is not None:
+            row = self.population.user_row(index, self.reminder_time)
+            user = self.users[discord_id] = dict(row, id=discord_id)
+        return user
+
+    def _checkins_for(self, discord_id: str) -> dict:
+        checkins = self.checkins.get(discord_id)
+        if checkins is None:
+            index = self.population.index_of(discord_id)
+            rows = self.population.checkin_rows(index, discord_id) if index is not None else []
+            checkins = self.checkins[discord_id] = {r['date']: r for r in rows}
+        return checkins
+
+    async def get_or_create_user(self, discord_id: str, username: str) -> dict:
+        self._materialize(discord_id)
+        return await super().get_or_create_user(discord_id, username)
+
+    async def get_user(self, discord_id: str) -> Optional[dict]:
+        self._materialize(discord_id)
+        return await super().get_user(discord_id)
+
+
+class CountingBackend:
+    """Transparent proxy around a storage engine that counts method calls"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.calls = Counter()
+
+    def __getattr__(self, attr):
+        value = getattr(self.backend, attr)
+        if not callable(value) or attr.startswith('_'):
+            return value
+
+        def counted(*args, **kwargs):
+            self.calls[f"storage.{attr}"] += 1
+            return value(*args, **kwargs)
+        return counted
+
+
+class FakeOpenAI:
+    """Drop-in for the `openai` module: `FakeOpenAI(...).OpenAI(api_key=...)`"""
+
+    def __init__(self, latency: float = 0.0, model_latency: dict = None):
+        self.latency = latency
+        self.model_latency = model_latency or {}  # model -> seconds, overrides `latency`
+        self.calls = Counter()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def OpenAI(self, api_key: str = None, **kwargs):
+        return self
+
+    def _create(self, model: str, messages: list, max_tokens: int = None, timeout: float = None, **kwargs):
+        self.calls[model] += 1
+        latency = self.model_latency.get(model, self.latency)
+        if timeout is not None and latency > timeout:
+            # Like the SDK, give up on the request once its timeout passes
+            time.sleep(timeout)
+            raise TimeoutError(f"{model} request timed out")
+        if latency:
+            time.sleep(latency)
+        prompt_tokens = sum(len(m['content']) for m in messages) // 4
+        content = "Look, showing up is the hard part and you're doing it."
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                                  total_tokens=prompt_tokens + len(content) // 4),
+            model=model,
+        )
+
+
+class FakeAttachment:
+    """Stand-in for `discord.Attachment` holding the file bytes in memory"""
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.size = len(data)
+        self.data = data
+
+    async def save(self, fp, **kwargs):
+        fp.write(self.data)
+        return self.size
+
+    async def read(self, **kwargs):
+        return self.data
+
+
+class FakeMessage:
+    _next_id = 1
+
+    def __init__(self, content=None, embed=None, file=None):
+        self.id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+        self.content = content
+        self.embed = embed
+        self.file = file
+        self.reactions = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embed = embed
+
+    async def clear_reactions(self):
+        self.reactions.clear()
+
+
+class FakeAuthor:
+    def __init__(self, discord_id: str, name: str = None):
+        self.id = int(discord_id)
+        self.name = name or f"user{discord_id}"
+        self.sent = []
+
+    def __str__(self):
+        return f"{self.name}#0001"
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return self.id
+
+    async def send(self, content=None, embed=None, file=None, **kwargs):
+        message = FakeMessage(content, embed, file)
+        self.sent.append(message)
+        return message
+
+
+class FakeContext:
+    """Just enough of `commands.Context` for the bot's command callbacks"""
+
+    def __init__(self, author: FakeAuthor, guild_id: int = 1, attachments: list = None):
+        self.author = author
+        self.guild = SimpleNamespace(id=guild_id, name='bench-guild')
+        self.message = SimpleNamespace(id=FakeMessage._next_id, author=author, attachments=attachments or [])
+        self.sent = []
+
+    async def send(self, content=None, embed=None, file=None, **kwargs):
+        message = FakeMessage(content, embed, file)
+        self.sent.append(message)
+        return message
+
+    def typing(self):
+        return _NullAsyncContext()
+
+
+class _NullAsyncContext:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
@@ -0,0 +1,244 @@
+import asyncio
+import random
+import time
+from collections import Counter, deque
+from typing import Callable, Optional
+
+# USD per 1M (prompt, completion) tokens, models missing here are treated as free
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-3.5-turbo': (0.50, 1.50),
+}
+CHARS_PER_TOKEN = 4
+LATENCY_SMOOTHING = 0.2  # weight of the newest sample in the latency EWMA
+LATENCY_HISTORY = 500    # responses per route kept for the p50/p95 gauges
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough prompt size without a tokenizer, ~4 characters per token"""
+    return sum(len(m['content']) for m in messages) // CHARS_PER_TOKEN + 1
+
+
+def percentile(sorted_values: list, pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Route:
+    """One AI command: its reply length limits and what to answer when no model can
+
+    The token budget starts at `min_tokens` and grows by
+    `tokens_per_request_token` for every token of the user's message, up to
+    `max_tokens` - a two-line thought doesn't need the same room as a week of
+    check-ins. Routes without a per-token factor always get `max_tokens`;
+    `min_tokens` is then only the floor under latency or cost pressure. With `cache_size`, successful answers are kept and reused as
+    the fallback; only use that for prompts that aren't personal. Otherwise
+    one of `templates` is sent.
+    """
+
+    def __init__(self, name: str, max_tokens: int, min_tokens: int, templates: list,
+                 tokens_per_request_token: float = 0.0, cache_size: int = 0):
+        self.name = name
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.tokens_per_request_token = tokens_per_request_token
+        self.templates = templates
+        self.cached = deque(maxlen=cache_size) if cache_size else None
+
+    def token_budget(self, request_tokens: int) -> int:
+        if not self.tokens_per_request_token:
+            return self.max_tokens
+        return min(self.max_tokens, self.min_tokens + int(request_tokens * self.tokens_per_request_token))
+
+    def fallback_answer(self) -> str:
+        if self.cached:
+            return random.choice(self.cached)
+        return random.choice(self.templates)
+
+
+class ModelHealth:
+    """Smoothed latency of one model, and whether it is benched after timing out"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency: Optional[float] = None  # EWMA seconds, None until the first answer
+        self.timeouts = 0
+        self.errors = 0
+        self.benched_until = 0.0
+
+    def record(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def available(self, now: float) -> bool:
+        return now >= self.benched_until
+
+
+class RouteStats:
+    """Per-route counters behind the /metrics gauges"""
+
+    def __init__(self):
+        self.served = Counter()  # model name or 'fallback' -> responses
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+
+class AIRouter:
+    """Picks a model and reply length per AI request, within latency and cost SLOs
+
+    `models` are tried in order. A model is skipped while benched (it timed
+    out in the last `cooldown` seconds) or if even `min_tokens` of reply would
+    cost more than `max_cost` dollars; otherwise max_tokens is cut to fit the
+    cost cap, and to `min_tokens` while the model's smoothed latency is over
+    the budget. Every attempt gets what is left of `latency_budget` minus the
+    expected latency of the next model, so a slow primary still leaves time to
+    fall back. When no model answers in time the route's fallback text is
+    sent, so the whole command stays within budget.
+
+    Calls run in a worker thread through `get_client()`, an OpenAI-style client
+    built with `max_retries=0` - SDK retries would keep the thread busy with
+    fresh requests after the router has already moved on.
+    """
+
+    def __init__(self, get_client: Callable, models: list, latency_budget: float,
+                 max_cost: Optional[float] = None, cooldown: float = 60.0):
+        self.get_client = get_client
+        self.models = {name: ModelHealth(name) for name in models}
+        self.latency_budget = latency_budget
+        self.max_cost = max_cost
+        self.cooldown = cooldown
+        self.routes = {}
+        self.stats = {}
+
+    def add_route(self, route: Route):
+        self.routes[route.name] = route
+        self.stats[route.name] = RouteStats()
+
+    @staticmethod
+    def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    def plan(self, route: Route, messages: list, now: Optional[float] = None) -> list:
+        """(model, max_tokens) to try in order for one request"""
+        now = time.monotonic() if now is None else now
+        prompt_tokens = estimate_tokens(messages)
+        # Size the reply from what the user sent, not the system prompt
+        request_tokens = estimate_tokens([m for m in messages if m['role'] == 'user'])
+        attempts = []
+        for health in self.models.values():
+            if not health.available(now):
+                continue
+            max_tokens = route.token_budget(request_tokens)
+            if self.max_cost is not None:
+                _, completion_price = MODEL_PRICES.get(health.name, (0.0, 0.0))
+                spare = self.max_cost - self.estimate_cost(health.name, prompt_tokens, 0)
+                if completion_price:
+                    max_tokens = min(max_tokens, int(spare * 1_000_000 / completion_price))
+                if spare < 0 or max_tokens < route.min_tokens:
+                    continue
+            if health.latency is not None and health.latency > self.latency_budget:
+                # The provider is slow right now - shorter replies come back sooner
+                max_tokens = route.min_tokens
+            attempts.append((health.name, max_tokens))
+        return attempts
+
+    async def complete(self, route_name: str, messages: list) -> tuple:
+        """Answer `messages` on a route, returns (text, model) - model is None for the fallback text"""
+        route = self.routes[route_name]
+        stats = self.stats[route_name]
+        started = time.monotonic()
+        deadline = started + self.latency_budget
+        prompt_tokens = estimate_tokens(messages)
+        attempts = self.plan(route, messages, started)
+
+        for index, (model, max_tokens) in enumerate(attempts):
+            remaining = deadline - time.monotonic()
+            if index + 1 < len(attempts):
+                # Leave the next model the time it usually needs, but never more than half
+                expected = self.models[attempts[index + 1][0]].latency
+                remaining -= min(expected if expected is not None else remaining / 2, remaining / 2)
+            if remaining <= 0:
+                break
+
+            health = self.models[model]
+            attempt_started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(self._create, model, messages, max_tokens, remaining),
+                    timeout=remaining
+                )
+            except Exception as e:
+                # Either our deadline or the SDK's own request timeout (APITimeoutError)
+                if isinstance(e, asyncio.TimeoutError) or type(e).__name__ == 'APITimeoutError':
+                    health.timeouts += 1
+                    health.record(time.monotonic() - attempt_started)
+                    health.benched_until = time.monotonic() + self.cooldown
+                    print(f"🐢 {model} took over {remaining * 1000:.0f}ms on !{route_name}, benched for {self.cooldown:.0f}s")
+                else:
+                    health.errors += 1
+                    print(f"OpenAI error on {model}: {e}")
+                continue
+
+            health.record(time.monotonic() - attempt_started)
+            text = response.choices[0].message.content
+            usage = getattr(response, 'usage', None)
+            used_prompt = getattr(usage, 'prompt_tokens', prompt_tokens)
+            used_completion = getattr(usage, 'completion_tokens', len(text or '') // CHARS_PER_TOKEN)
+            stats.prompt_tokens += used_prompt
+            stats.completion_tokens += used_completion
+            stats.cost += self.estimate_cost(model, used_prompt, used_completion)
+            stats.served[model] += 1
+            stats.latencies.append(time.monotonic() - started)
+            if route.cached is not None and text:
+                route.cached.append(text)
+            return text, model
+
+        stats.served['fallback'] += 1
+        stats.latencies.append(time.monotonic() - started)
+        return route.fallback_answer(), None
+
+    def _create(self, model: str, messages: list, max_tokens: int, timeout: float):
+        # The SDK timeout closes the request too, instead of leaving the worker thread waiting on it
+        return self.get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+
+    def metrics(self) -> list:
+        """Per-route and per-model samples in the `format_prometheus` shape"""
+        latency_samples = []
+        for name, stats in self.stats.items():
+            latencies = sorted(stats.latencies)
+            for quantile, pct in (('0.5', 50), ('0.95', 95)):
+                value = percentile(latencies, pct)
+                latency_samples.append(({'route': name, 'quantile': quantile},
+                                        round(value * 1000, 1) if value is not None else None))
+        return [
+            ('habitual_ai_responses', 'counter', 'AI responses per route and model (model="fallback" for canned answers)',
+             [({'route': name, 'model': model}, count)
+              for name, stats in self.stats.items() for model, count in stats.served.items()]),
+            ('habitual_ai_latency_ms', 'gauge', 'AI response time over the recent responses of each route',
+             latency_samples),
+            ('habitual_ai_tokens', 'counter', 'Tokens used per route',
+             [({'route': name, 'kind': kind}, count) for name, stats in self.stats.items()
+              for kind, count in (('prompt', stats.prompt_tokens), ('completion', stats.completion_tokens))]),
+            ('habitual_ai_cost_dollars', 'counter', 'Estimated OpenAI spend per route',
+             [({'route': name}, round(stats.cost, 6)) for name, stats in self.stats.items()]),
+            ('habitual_ai_model_latency_ms', 'gauge', 'Smoothed latency of each model',
+             [({'model': name}, round(health.latency * 1000, 1) if health.latency is not None else None)
+              for name, health in self.models.items()]),
+            ('habitual_ai_model_timeouts', 'counter', 'Requests a model didn\'t answer within its budget',
+             [({'model': name}, health.timeouts) for name, health in self.models.items()]),
+        ]
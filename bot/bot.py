@@ -1,14 +1,38 @@
+# Taken before any other import so startup timing covers the imports too
+from time import perf_counter
+STARTED_AT = perf_counter()
+
 import os
+import io
+import csv
 import asyncio
+import signal
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
 from datetime import datetime, date, time, timedelta
 from typing import Optional
 import discord
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
-import openai
-from supabase import create_client, Client
 import json
 import pytz
+from diagnostics import LoopStallMonitor, SamplingProfiler
+from storage import StorageBackend, create_backend
+from importer import detect_format, iter_import_rows, CheckinValidator
+from streaks import LeaderboardIndex, CONSISTENCY_WINDOW
+from moods import MoodIndex, MoodSeries, WEEKDAYS
+from heatmap import render_heatmap, CALENDAR_WEEKS
+from snapshot import save_snapshot, load_snapshot
+from metrics import MetricsServer
+from timezones import TimezoneIndex, DEFAULT_ZONE
+from ai_router import AIRouter, Route
+
+# phase -> seconds since the process started
+startup_timings = {'imports': perf_counter() - STARTED_AT}
 
 # Load environment variables
 load_dotenv()
@@ -18,11 +42,40 @@ DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE')
 USE_LOCAL_ONLY = os.getenv('USE_LOCAL_ONLY', 'false').lower() == 'true'
-
-# Initialize Supabase client
-supabase: Client = None
-if not USE_LOCAL_ONLY and SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# supabase | local | memory - defaults to Supabase when configured, local JSON otherwise
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND') or ('local' if USE_LOCAL_ONLY else None)
+LOOP_STALL_THRESHOLD_MS = int(os.getenv('LOOP_STALL_THRESHOLD_MS', '250'))
+MAX_PROFILE_SECONDS = 300
+HISTORY_PAGE_SIZE = 10
+HISTORY_TIMEOUT = 120.0
+EXPORT_PAGE_SIZE = 500
+EXPORT_FIELDS = ['date', 'mood', 'message', 'created_at']
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_BYTES = 25 * 1024 * 1024
+IMPORT_PROGRESS_INTERVAL = 2.0  # seconds between progress message edits
+# Computed stats, mood series and calendars are reused until the user writes or this many seconds pass
+# (other clients such as the web dashboard can write behind the bot's back)
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '300'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '600'))
+# Hot caches are written here on shutdown and reloaded on the next start (empty disables)
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', 'state_snapshot.json.gz')
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', '900'))
+# A check-in this long after a reminder DM counts as prompted by it
+REMINDER_ATTRIBUTION_HOURS = 12
+STATS_DEFAULT_DAYS = 7
+STATS_MAX_DAYS = 60
+# Serves /metrics (Prometheus) and /stats.json when set
+METRICS_PORT = int(os.getenv('METRICS_PORT')) if os.getenv('METRICS_PORT') else None
+LEADERBOARD_SIZE = 10
+LEADERBOARD_REFRESH_MINUTES = int(os.getenv('LEADERBOARD_REFRESH_MINUTES', '15'))
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '2'))
+CALENDAR_CACHE_SIZE = 1000  # rendered PNGs are ~1 KB each
+# AI commands try these models in order, falling back to the next one (then a
+# canned answer) when a model is slow or failing
+AI_MODELS = [m.strip() for m in os.getenv('AI_MODELS', 'gpt-4o-mini,gpt-4.1-nano').split(',') if m.strip()]
+AI_LATENCY_BUDGET_MS = int(os.getenv('AI_LATENCY_BUDGET_MS', '8000'))
+AI_MAX_COST = float(os.getenv('AI_MAX_COST')) if os.getenv('AI_MAX_COST') else None  # USD per request
+AI_COOLDOWN = int(os.getenv('AI_COOLDOWN', '60'))  # seconds a model that timed out is skipped
 
 # Bot setup
 intents = discord.Intents.default()
@@ -50,278 +103,500 @@ Avoid:
 
 Keep responses concise (2-3 sentences max) and conversational."""
 
+MOOD_EMOJIS = ["", "😔", "😕", "😐", "😊", "😄"]
+
+def format_checkin_line(checkin: dict) -> str:
+    """Format a check-in as a single line for embeds"""
+    date_str = checkin.get('date', 'Unknown')
+    message = checkin.get('message') or 'No message'
+    mood = checkin.get('mood')
+    
+    line = f"**{date_str}**: {message}"
+    if mood:
+        line += f" ({mood}/5 {MOOD_EMOJIS[mood]})"
+    return line
+
 class HabitTracker:
-    def __init__(self):
-        self.local_file = 'checkins.json'
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+        self._stats_cache = {}  # discord_id -> (day computed for, expires at, stats)
+        self._users = {}  # discord_id -> (expires at, user row)
+        self._reminders = None  # (expires at, users with reminders)
+        self._reminded = {}  # discord_id -> when (epoch seconds) their last reminder was sent
+        self.timezones = TimezoneIndex()
+        self._known_members = set()  # (guild_id, discord_id) pairs already stored
+        self.moods = MoodIndex(ttl=STATS_CACHE_TTL)
+        self._calendar_cache = OrderedDict()  # discord_id -> (day rendered for, expires, png bytes)
+        self._calendar_versions = {}  # discord_id -> write counter, guards in-flight renders
+        self._calendar_rendering = Counter()  # discord_id -> renders in flight
         
+    def _cached_user(self, discord_id: str) -> Optional[dict]:
+        cached = self._users.get(discord_id)
+        if cached and cached[0] > monotonic():
+            return cached[1]
+        return None
+    
     async def get_or_create_user(self, discord_id: str, username: str) -> dict:
-        """Get user from database or create if doesn't exist"""
-        if USE_LOCAL_ONLY:
-            return {'id': discord_id, 'discord_id': discord_id, 'discord_username': username}
-            
-        try:
-            # Try to get existing user
-            result = supabase.table('users').select('*').eq('discord_id', discord_id).execute()
-            
-            if result.data:
-                return result.data[0]
-            else:
-                # Create new user - use service role for RLS bypass
-                new_user = {
-                    'discord_id': discord_id,
-                    'discord_username': username
-                }
-                # Use rpc call to bypass RLS for user creation
-                result = supabase.rpc('create_user_if_not_exists', {
-                    'p_discord_id': discord_id,
-                    'p_discord_username': username
-                }).execute()
-                
-                if result.data:
-                    return result.data[0] if isinstance(result.data, list) else result.data
-                else:
-                    # Fallback: try direct insert
-                    result = supabase.table('users').insert(new_user).execute()
-                    return result.data[0]
-                
-        except Exception as e:
-            print(f"Database error: {e}")
-            # Fallback to local mode for this user
-            return {'id': discord_id, 'discord_id': discord_id, 'discord_username': username}
+        """Get user from storage or create if doesn't exist"""
+        user = self._cached_user(discord_id)
+        if user is None:
+            user = await self.storage.get_or_create_user(discord_id, username)
+            if user:
+                self._cache_user(discord_id, user)
+        return user
+    
+    def _cache_user(self, discord_id: str, user: dict):
+        self._users[discord_id] = (monotonic() + USER_CACHE_TTL, user)
+        self.timezones.set_zone(discord_id, user.get('timezone'))
+    
+    async def get_user_timezone(self, discord_id: str) -> Optional[str]:
+        """Get the user's timezone name, None if they never set one"""
+        user = self._cached_user(discord_id)
+        if user is None:
+            user = await self.storage.get_user(discord_id)
+            if user:
+                self._cache_user(discord_id, user)
+        return user.get('timezone') if user else None
+    
+    async def load_timezones(self):
+        """Fill the timezone index for every user in one pass"""
+        before = dict(self.timezones.user_zones)
+        user_zones = await self.storage.get_user_timezones()
+        # Zones that changed while the scan ran are newer than what it read
+        changed = {d for d, zone in self.timezones.user_zones.items() if before.get(d) != zone}
+        self.timezones.load(user_zones, keep=changed)
+    
+    async def _update_user(self, discord_id: str, fields: dict) -> bool:
+        success = await self.storage.update_user(discord_id, fields)
+        if success:
+            self._users.pop(discord_id, None)
+            self._reminders = None
+            if 'timezone' in fields:
+                # "Today" moved, so did everything computed relative to it
+                self.timezones.set_zone(discord_id, fields['timezone'])
+                self.invalidate_stats(discord_id)
+                self.invalidate_calendar(discord_id)
+        return success
+    
+    async def set_timezone(self, discord_id: str, tz_name: str) -> bool:
+        """Store the user's timezone"""
+        return await self._update_user(discord_id, {'timezone': tz_name})
+    
+    async def set_reminder(self, discord_id: str, reminder_time: time, tz_name: str) -> bool:
+        """Store the user's daily reminder (UTC time) along with their timezone"""
+        return await self._update_user(discord_id, {
+            'reminder_time': reminder_time.isoformat(),
+            'timezone': tz_name
+        })
+    
+    async def clear_reminder(self, discord_id: str) -> bool:
+        """Turn off the user's daily reminder"""
+        return await self._update_user(discord_id, {'reminder_time': None})
+    
+    async def get_users_with_reminders(self) -> list:
+        """Get all users who have a reminder time set"""
+        if self._reminders and self._reminders[0] > monotonic():
+            return self._reminders[1]
+        reminders = await self.storage.get_users_with_reminders()
+        self._reminders = (monotonic() + USER_CACHE_TTL, reminders)
+        return reminders
+    
+    def _was_reminded(self, discord_id: str) -> bool:
+        sent_at = self._reminded.get(discord_id)
+        return sent_at is not None and datetime.now().timestamp() - sent_at < REMINDER_ATTRIBUTION_HOURS * 3600
+    
+    def note_reminder_sent(self, discord_id: str) -> bool:
+        """Remember a reminder DM for check-in attribution, False if one was already sent recently"""
+        if self._was_reminded(discord_id):
+            return False
+        self._reminded[discord_id] = datetime.now().timestamp()
+        return True
+    
+    async def record_reminders_sent(self, day: date, count: int) -> bool:
+        """Count reminder DMs towards the day's community rollup"""
+        return await self.storage.record_reminders_sent(day, count)
+    
+    async def get_community_stats(self, since: date, until: date) -> dict:
+        """Aggregate community activity between two dates
+        
+        Reads one pre-aggregated row per day from the daily rollups, so the cost
+        grows with the number of days asked for, not the number of check-ins.
+        """
+        rows = await self.storage.get_daily_rollups(since, until)
+        totals = {'checkins': 0, 'mood_sum': 0, 'reminder_checkins': 0, 'reminders_sent': 0}
+        histogram = [0, 0, 0, 0, 0]
+        days = []
+        for row in rows:
+            mood_count = sum(row['mood_histogram'])
+            days.append({
+                'date': row['date'],
+                'checkins': row['checkins'],
+                'average_mood': row['mood_sum'] / mood_count if mood_count else None,
+                'reminder_checkins': row['reminder_checkins'],
+                'reminders_sent': row['reminders_sent']
+            })
+            for key in totals:
+                totals[key] += row[key]
+            histogram = [a + b for a, b in zip(histogram, row['mood_histogram'])]
+        
+        mood_count = sum(histogram)
+        return {
+            'since': since.isoformat(),
+            'until': until.isoformat(),
+            'days': days,
+            'checkins': totals['checkins'],
+            'average_mood': totals['mood_sum'] / mood_count if mood_count else None,
+            'mood_histogram': histogram,
+            'reminders_sent': totals['reminders_sent'],
+            'reminder_checkins': totals['reminder_checkins'],
+            'reminder_conversion': totals['reminder_checkins'] / totals['reminders_sent']
+                                   if totals['reminders_sent'] else None
+        }
+    
+    async def remember_guild_member(self, guild_id: str, discord_id: str, username: str):
+        """Record that a user uses the bot in a server (once per process)"""
+        if (guild_id, discord_id) in self._known_members:
+            return
+        await self.get_or_create_user(discord_id, username)
+        if await self.storage.add_guild_member(guild_id, discord_id):
+            self._known_members.add((guild_id, discord_id))
+    
+    async def get_guild_members(self, guild_id: str) -> list:
+        """Get discord ids of everyone who has used the bot in a server"""
+        return await self.storage.get_guild_members(guild_id)
+    
+    async def get_day_ordinals(self, discord_ids: list) -> dict:
+        """Get check-in dates as day ordinals for many users at once"""
+        return await self.storage.get_day_ordinals(discord_ids)
+    
+    async def get_checked_in(self, user_ids: dict, day: date) -> set:
+        """Which of many users (user id -> discord id) checked in on the given day, in one query
+        
+        Raises if storage fails, rather than guessing nobody did.
+        """
+        return await self.storage.get_checked_in(user_ids, day)
     
     async def add_checkin(self, user_id: str, discord_id: str, message: str = None, mood: int = None) -> dict:
         """Add a checkin for today - returns dict with success status and existing checkin info"""
         # Get user's timezone to determine their "today"
         user_today = await self._get_user_date(discord_id)
         
-        if USE_LOCAL_ONLY:
-            return self._add_local_checkin(discord_id, user_today, message, mood)
+        # First check if checkin already exists for today (in user's timezone)
+        existing = await self.storage.get_checkin(user_id, discord_id, user_today)
         
-        try:
-            # First check if checkin already exists for today (in user's timezone)
-            existing_result = supabase.table('checkins').select('*').eq('user_id', user_id).eq('date', user_today.isoformat()).execute()
-            
-            if existing_result.data:
-                # Return existing checkin info for confirmation
-                existing = existing_result.data[0]
-                return {
-                    'success': False,
-                    'existing': existing,
-                    'new_message': message,
-                    'new_mood': mood
-                }
-            
-            # Use RPC function for checkin creation to handle RLS properly
-            result = supabase.rpc('create_or_update_checkin', {
-                'p_user_discord_id': discord_id,
-                'p_date': user_today.isoformat(),
-                'p_message': message,
-                'p_mood': mood
-            }).execute()
-            
-            return {'success': result.data is not None, 'existing': None}
-            
-        except Exception as e:
-            print(f"Database error: {e}")
-            return self._add_local_checkin(discord_id, user_today, message, mood)
+        if existing:
+            # Return existing checkin info for confirmation
+            return {
+                'success': False,
+                'existing': existing,
+                'new_message': message,
+                'new_mood': mood
+            }
+        
+        success = await self.storage.upsert_checkin(user_id, discord_id, user_today, message, mood,
+                                                    self._was_reminded(discord_id))
+        if success:
+            self.invalidate_stats(discord_id)
+            self.moods.record(discord_id, user_today.toordinal(), mood)
+            self.invalidate_calendar(discord_id)
+        return {'success': success, 'existing': None}
     
     async def _get_user_date(self, discord_id: str) -> date:
         """Get the current date in the user's timezone"""
+        # Answered from the timezone index when possible, without a user lookup
+        today = self.timezones.today_for(discord_id)
+        if today is not None:
+            return today
+        
         try:
-            if not USE_LOCAL_ONLY and supabase:
-                # Get user's timezone from database
-                result = supabase.table('users').select('timezone').eq('discord_id', discord_id).execute()
-                if result.data and result.data[0].get('timezone'):
-                    user_tz = pytz.timezone(result.data[0]['timezone'])
-                    return datetime.now(user_tz).date()
-            
-            # Default to UTC if no timezone is set or in local mode
-            return date.today()
+            tz_name = await self.get_user_timezone(discord_id)
+            # Default to UTC if no timezone is set
+            return TimezoneIndex.local_date(tz_name or DEFAULT_ZONE)
             
         except Exception as e:
             print(f"Error getting user timezone: {e}")
-            return date.today()
-    
-    def _add_local_checkin(self, discord_id: str, date_obj: date, message: str, mood: int) -> dict:
-        """Add checkin to local JSON file - returns dict with success status and existing checkin info"""
-        try:
-            # Load existing data
-            if os.path.exists(self.local_file):
-                with open(self.local_file, 'r') as f:
-                    data = json.load(f)
-            else:
-                data = {}
-            
-            # Initialize user data if needed
-            if discord_id not in data:
-                data[discord_id] = []
-            
-            # Check if checkin already exists for today
-            date_str = date_obj.isoformat()
-            existing = next((c for c in data[discord_id] if c['date'] == date_str), None)
-            
-            if existing:
-                # Return existing checkin info for confirmation
-                return {
-                    'success': False,
-                    'existing': existing,
-                    'new_message': message,
-                    'new_mood': mood
-                }
-            else:
-                # Add new checkin
-                checkin = {
-                    'date': date_str,
-                    'message': message,
-                    'mood': mood,
-                    'created_at': datetime.now().isoformat()
-                }
-                data[discord_id].append(checkin)
-                
-                # Save back to file
-                with open(self.local_file, 'w') as f:
-                    json.dump(data, f, indent=2)
-                
-                return {'success': True, 'existing': None}
-            
-        except Exception as e:
-            print(f"Local storage error: {e}")
-            return {'success': False, 'existing': None}
+            return TimezoneIndex.local_date(DEFAULT_ZONE)
     
     async def update_checkin(self, user_id: str, discord_id: str, message: str = None, mood: int = None) -> bool:
         """Force update today's checkin (after confirmation)"""
         # Get user's timezone to determine their "today"
         user_today = await self._get_user_date(discord_id)
+        success = await self.storage.upsert_checkin(user_id, discord_id, user_today, message, mood,
+                                                    self._was_reminded(discord_id))
+        if success:
+            self.invalidate_stats(discord_id)
+            self.moods.record(discord_id, user_today.toordinal(), mood)
+            self.invalidate_calendar(discord_id)
+        return success
+    
+    async def import_checkins(self, user_id: str, discord_id: str, rows, overwrite: bool = False,
+                              progress=None) -> dict:
+        """Validate and write historical check-ins in bounded batches
+        
+        `rows` yields (line number, raw row) pairs; `progress` is an optional
+        coroutine called with (rows read, rows imported) after every batch.
+        Stats are recomputed once at the end instead of after every row.
+        """
+        validator = CheckinValidator(await self._get_user_date(discord_id))
+        result = {'read': 0, 'imported': 0, 'invalid': 0, 'errors': [], 'failed': False}
+        batch = []
         
-        if USE_LOCAL_ONLY:
-            return self._update_local_checkin(discord_id, user_today, message, mood)
+        async def flush():
+            written = await self.storage.bulk_upsert_checkins(user_id, discord_id, batch, overwrite)
+            if written is None:
+                result['failed'] = True
+                return
+            result['imported'] += written
+            batch.clear()
+            if progress:
+                await progress(result['read'], result['imported'])
         
         try:
-            # Use RPC function to update checkin
-            result = supabase.rpc('create_or_update_checkin', {
-                'p_user_discord_id': discord_id,
-                'p_date': user_today.isoformat(),
-                'p_message': message,
-                'p_mood': mood
-            }).execute()
-            
-            return result.data is not None
+            for line_no, row in rows:
+                result['read'] += 1
+                checkin, error = validator.validate(row)
+                if error:
+                    result['invalid'] += 1
+                    if len(result['errors']) < 5:
+                        result['errors'].append(f"line {line_no}: {error}")
+                    continue
+                
+                batch.append(checkin)
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    await flush()
+                    if result['failed']:
+                        break
             
-        except Exception as e:
-            print(f"Database error: {e}")
-            return self._update_local_checkin(discord_id, user_today, message, mood)
+            if batch and not result['failed']:
+                await flush()
+        finally:
+            # Batches already written count even if reading the rest of the file failed
+            self.invalidate_stats(discord_id)
+            self.moods.invalidate(discord_id)
+            self.invalidate_calendar(discord_id)
+        return result
     
-    def _update_local_checkin(self, discord_id: str, date_obj: date, message: str, mood: int) -> bool:
-        """Force update checkin in local JSON file"""
+    async def get_mood_trends(self, user_id: str, discord_id: str) -> Optional[dict]:
+        """Get rolling mood averages, weekday pattern and streak/mood correlation
+        
+        Served from the user's in-memory mood rollup, which is loaded once and then
+        kept up to date by check-ins instead of re-reading every check-in per request.
+        """
+        series = await self._get_mood_series(user_id, discord_id)
+        if not series.corr['n']:
+            return None
+        
+        today = (await self._get_user_date(discord_id)).toordinal()
+        return {
+            'averages': {days: series.window_average(today, days) for days in (7, 30, 90)},
+            'weekdays': series.weekday_averages(),
+            'correlation': series.streak_mood_correlation(),
+            'mood_days': series.corr['n']
+        }
+    
+    async def _get_mood_series(self, user_id: str, discord_id: str) -> MoodSeries:
+        series = self.moods.get(discord_id)
+        if series is None:
+            rows = await self.storage.get_mood_days(user_id, discord_id)
+            series = MoodSeries({date.fromisoformat(d).toordinal(): mood for d, mood in rows})
+            self.moods.put(discord_id, series)
+        return series
+    
+    async def get_calendar(self, user_id: str, discord_id: str, executor=None) -> Optional[bytes]:
+        """Get the user's year heatmap PNG, rendered in `executor` on a cache miss"""
+        today = await self._get_user_date(discord_id)
+        cached = self._calendar_cache.get(discord_id)
+        if cached and cached[0] == today and cached[1] > monotonic():
+            self._calendar_cache.move_to_end(discord_id)
+            return cached[2]
+        
+        version = self._calendar_versions.get(discord_id, 0)
+        self._calendar_rendering[discord_id] += 1
         try:
-            # Load existing data
-            if os.path.exists(self.local_file):
-                with open(self.local_file, 'r') as f:
-                    data = json.load(f)
-            else:
-                return False
-            
-            if discord_id not in data:
-                return False
-            
-            # Find and update existing checkin
-            date_str = date_obj.isoformat()
-            for checkin in data[discord_id]:
-                if checkin['date'] == date_str:
-                    checkin['message'] = message
-                    checkin['mood'] = mood
-                    checkin['updated_at'] = datetime.now().isoformat()
-                    break
-            
-            # Save back to file
-            with open(self.local_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            
-            return True
+            series = await self._get_mood_series(user_id, discord_id)
+            first_day = today.toordinal() - CALENDAR_WEEKS * 7
+            cells = {day: mood for day, mood in series.rows.items() if day > first_day}
+            if not cells:
+                return None
             
-        except Exception as e:
-            print(f"Local storage error: {e}")
-            return False
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(executor, render_heatmap, cells, today.toordinal())
+        finally:
+            self._calendar_rendering[discord_id] -= 1
+            if not self._calendar_rendering[discord_id]:
+                del self._calendar_rendering[discord_id]
+        
+        # Don't cache a render that a check-in made stale while it was running
+        if self._calendar_versions.get(discord_id, 0) == version:
+            self._calendar_cache[discord_id] = (today, monotonic() + STATS_CACHE_TTL, png)
+            self._calendar_cache.move_to_end(discord_id)
+            while len(self._calendar_cache) > CALENDAR_CACHE_SIZE:
+                self._calendar_cache.popitem(last=False)
+        return png
+    
+    def invalidate_calendar(self, discord_id: str):
+        """Drop a user's rendered calendar after their check-ins change"""
+        self._calendar_versions[discord_id] = self._calendar_versions.get(discord_id, 0) + 1
+        self._calendar_cache.pop(discord_id, None)
+    
+    def purge_expired(self) -> int:
+        """Drop cache entries past their TTL, which are otherwise only replaced on read
+        
+        Returns how many entries were dropped.
+        """
+        now = monotonic()
+        expired_users = [d for d, (expires, _) in self._users.items() if expires <= now]
+        expired_stats = [d for d, (_, expires, _) in self._stats_cache.items() if expires <= now]
+        expired_reminded = [d for d in self._reminded if not self._was_reminded(d)]
+        # Write counters only matter while a render is in flight
+        idle_versions = [d for d in self._calendar_versions if d not in self._calendar_rendering]
+        expired_calendars = [d for d, (_, expires, _) in self._calendar_cache.items() if expires <= now]
+        for discord_id in expired_users:
+            del self._users[discord_id]
+        for discord_id in expired_stats:
+            del self._stats_cache[discord_id]
+        for discord_id in expired_reminded:
+            del self._reminded[discord_id]
+        for discord_id in idle_versions:
+            del self._calendar_versions[discord_id]
+        for discord_id in expired_calendars:
+            del self._calendar_cache[discord_id]
+        return (len(expired_users) + len(expired_stats) + len(expired_reminded) + len(idle_versions)
+                + len(expired_calendars) + self.moods.purge_expired())
+    
+    def export_state(self) -> dict:
+        """Hot caches as JSON-friendly data for a restart snapshot, TTLs as seconds left"""
+        now = monotonic()
+        return {
+            'users': {d: [expires - now, user] for d, (expires, user) in self._users.items() if expires > now},
+            'stats': {
+                d: [day.isoformat(), expires - now, stats]
+                for d, (day, expires, stats) in self._stats_cache.items() if expires > now
+            },
+            'reminders': [self._reminders[0] - now, self._reminders[1]]
+                         if self._reminders and self._reminders[0] > now else None,
+            'known_members': sorted(self._known_members),
+            'reminded': {d: sent_at for d, sent_at in self._reminded.items() if self._was_reminded(d)}
+        }
+    
+    def restore_state(self, state: dict, age: float) -> int:
+        """Load caches saved by export_state `age` seconds ago, returns entries restored
+        
+        Entries keep the TTL they had left minus the downtime, and anything
+        already fetched by this process wins over the snapshot.
+        """
+        base = monotonic() - age
+        restored = 0
+        for discord_id, (ttl, user) in state.get('users', {}).items():
+            if ttl > age and discord_id not in self._users:
+                self._users[discord_id] = (base + ttl, user)
+                restored += 1
+        for discord_id, (day, ttl, stats) in state.get('stats', {}).items():
+            if ttl > age and discord_id not in self._stats_cache:
+                self._stats_cache[discord_id] = (date.fromisoformat(day), base + ttl, stats)
+                restored += 1
+        reminders = state.get('reminders')
+        if reminders and reminders[0] > age and self._reminders is None:
+            self._reminders = (base + reminders[0], reminders[1])
+            restored += 1
+        for guild_id, discord_id in state.get('known_members', []):
+            self._known_members.add((guild_id, discord_id))
+        for discord_id, sent_at in state.get('reminded', {}).items():
+            self._reminded.setdefault(discord_id, sent_at)
+        return restored
+    
+    def invalidate_stats(self, discord_id: str):
+        """Drop the user's cached stats after their check-ins changed"""
+        self._stats_cache.pop(discord_id, None)
     
     async def get_user_stats(self, user_id: str, discord_id: str) -> dict:
         """Get user's habit statistics"""
-        if USE_LOCAL_ONLY:
-            return self._get_local_stats(discord_id)
+        today = await self._get_user_date(discord_id)
+        cached = self._stats_cache.get(discord_id)
+        if cached and cached[0] == today and cached[1] > monotonic():
+            return cached[2]
         
-        try:
-            result = supabase.table('checkins').select('*').eq('user_id', user_id).order('date', desc=True).execute()
-            checkins = result.data
-            
-            if not checkins:
-                return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': []}
-            
-            # Calculate stats
-            total = len(checkins)
-            current_streak = self._calculate_current_streak([c['date'] for c in checkins])
-            best_streak = self._calculate_best_streak([c['date'] for c in checkins])
-            recent = checkins[:5]  # Last 5 checkins
-            
-            return {
-                'total': total,
-                'current_streak': current_streak,
-                'best_streak': best_streak,
-                'recent': recent
-            }
-            
-        except Exception as e:
-            print(f"Database error: {e}")
-            return self._get_local_stats(discord_id)
+        stats = await self._compute_user_stats(user_id, discord_id, today)
+        self._stats_cache[discord_id] = (today, monotonic() + STATS_CACHE_TTL, stats)
+        return stats
     
-    def _get_local_stats(self, discord_id: str) -> dict:
-        """Get stats from local JSON file"""
-        try:
-            if not os.path.exists(self.local_file):
-                return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': []}
-            
-            with open(self.local_file, 'r') as f:
-                data = json.load(f)
-            
-            if discord_id not in data:
-                return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': []}
-            
-            checkins = sorted(data[discord_id], key=lambda x: x['date'], reverse=True)
-            
-            if not checkins:
-                return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': []}
-            
-            total = len(checkins)
-            dates = [c['date'] for c in checkins]
-            current_streak = self._calculate_current_streak(dates)
-            best_streak = self._calculate_best_streak(dates)
-            recent = checkins[:5]
-            
-            return {
-                'total': total,
-                'current_streak': current_streak,
-                'best_streak': best_streak,
-                'recent': recent
-            }
-            
-        except Exception as e:
-            print(f"Local storage error: {e}")
-            return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': []}
+    def expire_streaks(self, discord_ids, today: date) -> int:
+        """Roll cached stats over to a new local day, zeroing streaks that just broke
+        
+        Run for a timezone's users right after its midnight, so cached stats stay
+        valid across the date change instead of being recomputed on the next read.
+        Returns how many streaks expired.
+        """
+        yesterday = today - timedelta(days=1)
+        expired = 0
+        for discord_id in discord_ids:
+            cached = self._stats_cache.get(discord_id)
+            if not cached:
+                continue
+            day, expires, stats = cached
+            if day != yesterday:
+                # Computed before yesterday - too old to roll forward safely
+                self._stats_cache.pop(discord_id, None)
+                continue
+            if stats['current_streak'] and stats['last_checkin'] < yesterday.isoformat():
+                stats = dict(stats, current_streak=0)
+                expired += 1
+            self._stats_cache[discord_id] = (today, expires, stats)
+        return expired
     
-    def _calculate_current_streak(self, dates: list) -> int:
-        """Calculate current streak from list of date strings"""
+    async def _compute_user_stats(self, user_id: str, discord_id: str, today: date) -> dict:
+        """Compute streaks, totals and recent entries from storage"""
+        # Streaks only need the dates, full rows are fetched just for the recent page
+        dates = await self.storage.get_checkin_dates(user_id, discord_id)
+        
+        if not dates:
+            return {'total': 0, 'current_streak': 0, 'best_streak': 0, 'recent': [], 'last_checkin': None}
+        
+        # Calculate stats
+        total = len(dates)
+        current_streak = self._calculate_current_streak(dates, today)
+        best_streak = self._calculate_best_streak(dates)
+        recent = await self.storage.get_checkins_page(user_id, discord_id, limit=5)  # Last 5 checkins
+        
+        return {
+            'total': total,
+            'current_streak': current_streak,
+            'best_streak': best_streak,
+            'recent': recent,
+            'last_checkin': dates[0]
+        }
+    
+    async def get_checkins_page(self, user_id: str, discord_id: str, before: Optional[date] = None,
+                                limit: int = HISTORY_PAGE_SIZE) -> list:
+        """Get one page of check-ins older than `before`, newest first"""
+        return await self.storage.get_checkins_page(user_id, discord_id, before, limit)
+    
+    async def iter_checkins(self, user_id: str, discord_id: str, page_size: int = EXPORT_PAGE_SIZE):
+        """Yield the user's full history page by page, newest first, without loading it all"""
+        before = None
+        while True:
+            page = await self.storage.get_checkins_page(user_id, discord_id, before, page_size)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            before = date.fromisoformat(page[-1]['date'])
+    
+    def _calculate_current_streak(self, dates: list, today: date) -> int:
+        """Calculate current streak from list of date strings, relative to the user's local today"""
         if not dates:
             return 0
         
         # Sort dates in descending order
         sorted_dates = sorted([datetime.fromisoformat(d).date() if isinstance(d, str) else d for d in dates], reverse=True)
         
-        today = date.today()
         streak = 0
         
         # Check if there's a checkin today or yesterday (to account for different timezones)
         if sorted_dates[0] == today:
             streak = 1
             check_date = today
-        elif sorted_dates[0] == today.replace(day=today.day-1):
+        elif sorted_dates[0] == today - timedelta(days=1):
             streak = 1
             check_date = sorted_dates[0]
         else:
@@ -329,7 +604,7 @@ class HabitTracker:
         
         # Count consecutive days
         for i in range(1, len(sorted_dates)):
-            expected_date = check_date.replace(day=check_date.day-1)
+            expected_date = check_date - timedelta(days=1)
             if sorted_dates[i] == expected_date:
                 streak += 1
                 check_date = expected_date
@@ -357,13 +632,213 @@ class HabitTracker:
         
         return best_streak
 
-# Initialize habit tracker
-tracker = HabitTracker()
+# Initialize habit tracker with the storage engine selected at startup
+tracker = HabitTracker(create_backend(STORAGE_BACKEND, SUPABASE_URL, SUPABASE_KEY))
+
+# Per-server rankings, rebuilt in the background by refresh_leaderboards
+leaderboards = LeaderboardIndex(k=LEADERBOARD_SIZE)
+
+# Event loop diagnostics
+loop_monitor = LoopStallMonitor(threshold=LOOP_STALL_THRESHOLD_MS / 1000)
+profile_lock = asyncio.Lock()
+
+# Heavy client libraries are imported on first use, or in the background by
+# warm_up_clients once the bot is connecting, instead of at startup
+openai_client = None
+
+def get_openai_client(api_key: str):
+    """Get the shared OpenAI client, importing the SDK the first time"""
+    global openai_client
+    if openai_client is None:
+        import openai
+        # No SDK retries: ai_router does its own fallback within a latency budget, and a
+        # retrying request would keep its worker thread busy long after we gave up on it
+        openai_client = openai.OpenAI(api_key=api_key, max_retries=0)
+    return openai_client
+
+ai_router = AIRouter(
+    lambda: get_openai_client(os.getenv('OPENAI_API_KEY')),
+    AI_MODELS,
+    latency_budget=AI_LATENCY_BUDGET_MS / 1000,
+    max_cost=AI_MAX_COST,
+    cooldown=AI_COOLDOWN
+)
+ai_router.add_route(Route('reflect', max_tokens=200, min_tokens=80, tokens_per_request_token=1.0, templates=[
+    "Look, the AI is slow right now, but here's the thing: the check-ins you've logged are real. Showing up, even imperfectly, is the part that counts.",
+    "Here's the thing - I can't dig into your history right this second, but the fact that you're checking in and wanting perspective already says a lot. Keep showing up.",
+]))
+ai_router.add_route(Route('rewrite', max_tokens=150, min_tokens=60, tokens_per_request_token=1.5, templates=[
+    "Look, that thought is heavy, and it makes sense you feel it. But one rough stretch doesn't define you - what's one small thing you could do today?",
+    "Here's the thing: struggling doesn't mean failing. You noticed the thought and you're trying to reframe it, and that's the hard part.",
+]))
+ai_router.add_route(Route('idea', max_tokens=150, min_tokens=60, cache_size=20, templates=[
+    "Pick the smallest version of your habit - one push-up, one line of journaling - and do just that today.",
+    "Tie a new habit to something you already do: after your morning coffee, take two minutes for it.",
+    "Put tomorrow's first step somewhere you can't miss it tonight, like your shoes by the door.",
+]))
+
+def warm_up_clients():
+    """Import and build the storage and AI clients off the startup path"""
+    started = perf_counter()
+    try:
+        tracker.storage.warm_up()
+        if os.getenv('OPENAI_API_KEY'):
+            get_openai_client(os.getenv('OPENAI_API_KEY'))
+    except Exception as e:
+        print(f"Error warming up clients: {e}")
+        return
+    print(f"🔥 Clients ready in {(perf_counter() - started) * 1000:.0f} ms")
+
+def save_state_snapshot():
+    """Write hot caches to SNAPSHOT_PATH so the next process starts warm"""
+    if not SNAPSHOT_PATH:
+        return
+    try:
+        save_snapshot(SNAPSHOT_PATH, tracker.storage.name, tracker.export_state())
+        print(f"💾 Saved state snapshot to {SNAPSHOT_PATH}")
+    except Exception as e:
+        print(f"Error saving state snapshot: {e}")
+
+def restore_state_snapshot():
+    """Reload hot caches from the last shutdown if the snapshot is still valid"""
+    if not SNAPSHOT_PATH:
+        return
+    snapshot = load_snapshot(SNAPSHOT_PATH, tracker.storage.name, SNAPSHOT_MAX_AGE)
+    if snapshot:
+        state, age = snapshot
+        restored = tracker.restore_state(state, age)
+        print(f"♻️ Restored {restored} cached entries from a {age:.0f}s old snapshot")
+
+async def collect_stats(days: int) -> dict:
+    """Community stats for the last `days` days, for !stats and /stats.json"""
+    today = TimezoneIndex.local_date(DEFAULT_ZONE)
+    return await tracker.get_community_stats(today - timedelta(days=days - 1), today)
+
+async def collect_metrics() -> list:
+    """Gauges for the /metrics endpoint"""
+    today = await collect_stats(1)
+    week = await collect_stats(7)
+    return [
+        ('habitual_checkins', 'gauge', 'Check-ins logged in the window',
+         [({'window': '1d'}, today['checkins']), ({'window': '7d'}, week['checkins'])]),
+        ('habitual_mood_average', 'gauge', 'Average mood (1-5) of check-ins in the window',
+         [({'window': '1d'}, today['average_mood']), ({'window': '7d'}, week['average_mood'])]),
+        ('habitual_mood_checkins', 'gauge', 'Check-ins per mood over the last 7 days',
+         [({'mood': str(mood)}, count) for mood, count in enumerate(week['mood_histogram'], start=1)]),
+        ('habitual_reminders_sent', 'gauge', 'Reminder DMs sent over the last 7 days',
+         [({}, week['reminders_sent'])]),
+        ('habitual_reminder_conversion', 'gauge', 'Share of reminders followed by a check-in, last 7 days',
+         [({}, week['reminder_conversion'])]),
+        ('habitual_loop_stalls', 'gauge', 'Event loop stalls in the recent stall history',
+         [({}, len(loop_monitor.recent_stalls))]),
+    ] + ai_router.metrics()
+
+metrics_server = MetricsServer(METRICS_PORT, collect_metrics, collect_stats) if METRICS_PORT else None
+
+background_tasks = set()
+timezone_loader: Optional[asyncio.Task] = None
+
+async def load_timezone_index():
+    """Fill the timezone index in the background, retrying until the scan succeeds"""
+    retry_delay = 30
+    while True:
+        started = perf_counter()
+        try:
+            await tracker.load_timezones()
+            break
+        except Exception as e:
+            # Lookups keep covering users meanwhile, a partial index would give wrong dates
+            print(f"Error loading timezones, retrying in {retry_delay}s: {e}")
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 600)
+    print(f"🌍 Timezone index: {len(tracker.timezones.zones)} zones in {(perf_counter() - started) * 1000:.0f} ms")
+
+# Worker processes for image rendering, started on first use
+render_pool: Optional[ProcessPoolExecutor] = None
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Get the rendering process pool, starting it if needed"""
+    global render_pool
+    if render_pool is None:
+        # Fork workers from a server process that preloads the renderer, not from this
+        # one (threads, sockets). Each worker still re-imports this module as __mp_main__
+        # when it starts (~0.3 s), which is why setup_hook warms the pool up
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['heatmap'])
+        render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=context)
+    return render_pool
+
+async def warm_up_render_pool():
+    """Start every render worker with a no-op, so the first !calendar doesn't pay for it"""
+    started = perf_counter()
+    pool = get_render_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        # Workers are spawned on demand, one per task submitted while the others are busy
+        await asyncio.gather(*(loop.run_in_executor(pool, int) for _ in range(RENDER_WORKERS)))
+    except Exception as e:
+        print(f"Error warming up render workers: {e}")
+        return
+    print(f"🔥 Render workers ready in {(perf_counter() - started) * 1000:.0f} ms")
+
+@bot.event
+async def setup_hook():
+    # Fly.io stops machines with SIGTERM - close cleanly so the state snapshot is written
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:
+        pass  # No signal handlers on Windows event loops
+    
+    # Import the storage and AI clients while the gateway connection is set up
+    task = asyncio.create_task(asyncio.to_thread(warm_up_clients))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    task = asyncio.create_task(warm_up_render_pool())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    
+    if metrics_server:
+        await metrics_server.start()
+    startup_timings.setdefault('logged_in', perf_counter() - STARTED_AT)
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} has landed! Ready to help build habits.')
-    print(f'Storage mode: {"Local JSON" if USE_LOCAL_ONLY else "Supabase"}')
+    print(f'Storage mode: {tracker.storage.name}')
+    
+    restore_state_snapshot()
+    if 'ready' not in startup_timings:
+        startup_timings['ready'] = perf_counter() - STARTED_AT
+        print("⏱️ Startup: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup_timings.items()))
+    
+    # on_ready fires again after reconnects, start() is a no-op if already running
+    loop_monitor.start()
+    
+    # Scanning every user's timezone takes a while on big populations - until it's
+    # done, lookups answer "today" for users the index doesn't know yet
+    global timezone_loader
+    if not tracker.timezones.loaded and timezone_loader is None:
+        timezone_loader = asyncio.create_task(load_timezone_index())
+    
+    if not refresh_leaderboards.is_running():
+        refresh_leaderboards.start()
+    if not streak_expiry_sweep.is_running():
+        streak_expiry_sweep.start()
+    # Reminders survive restarts - don't wait for someone to run !remindme again
+    if not daily_reminder_check.is_running():
+        daily_reminder_check.start()
+    if not purge_caches.is_running():
+        purge_caches.start()
+
+@bot.before_invoke
+async def record_guild_member(ctx):
+    """Remember which servers people use the bot in, for per-server leaderboards"""
+    if 'first_command' not in startup_timings:
+        startup_timings['first_command'] = perf_counter() - STARTED_AT
+        print(f"⏱️ First command {startup_timings['first_command'] * 1000:.0f} ms after start")
+    
+    if ctx.guild:
+        await tracker.remember_guild_member(str(ctx.guild.id), str(ctx.author.id), str(ctx.author))
 
 @bot.command(name='checkin')
 async def checkin(ctx, mood_or_message=None, *, message: str = None):
@@ -461,7 +936,7 @@ async def checkin(ctx, mood_or_message=None, *, message: str = None):
                    reaction.message.id == confirmation_msg.id)
         
         try:
-            reaction, user = await bot.wait_for('reaction_add', timeout=30.0, check=check_reaction)
+            reaction, _ = await bot.wait_for('reaction_add', timeout=30.0, check=check_reaction)
             
             if str(reaction.emoji) == "✅":
                 # User confirmed - update the checkin
@@ -508,19 +983,308 @@ async def summary(ctx):
     embed.add_field(name="Best Streak", value=f"{stats['best_streak']} days", inline=True)
     
     if stats['recent']:
-        recent_text = ""
-        for checkin in stats['recent'][:3]:
-            date_str = checkin.get('date', 'Unknown')
-            message = checkin.get('message', 'No message')
-            mood = checkin.get('mood')
-            
-            line = f"**{date_str}**: {message}"
-            if mood:
-                mood_emojis = ["", "😔", "😕", "😐", "😊", "😄"]
-                line += f" ({mood}/5 {mood_emojis[mood]})"
-            recent_text += line + "\n"
+        recent_text = "\n".join(format_checkin_line(c) for c in stats['recent'][:3])
         embed.add_field(name="Recent Check-ins", value=recent_text, inline=False)
+        embed.set_footer(text="See everything with !history")
+    
+    await ctx.send(embed=embed)
+
+def build_history_embed(page: list, page_number: int, has_more: bool) -> discord.Embed:
+    """Build the embed for one page of !history"""
+    embed = discord.Embed(
+        title="📜 Your Check-in History",
+        description="\n".join(format_checkin_line(c) for c in page),
+        color=0x22c55e
+    )
+    
+    footer = f"Page {page_number}"
+    if page_number > 1:
+        footer += " · ⬅️ newer"
+    if has_more:
+        footer += " · ➡️ older"
+    embed.set_footer(text=footer)
+    return embed
+
+@bot.command(name='history')
+async def history(ctx):
+    """Browse all your check-ins, newest first (react ⬅️ ➡️ to turn pages)"""
+    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    user_id = user.get('id', str(ctx.author.id))
+    discord_id = str(ctx.author.id)
+    
+    # Keyset cursor for the start of every page visited so far, None = newest
+    cursors = [None]
+    
+    async def load_page():
+        # Fetch one extra row to know whether an older page exists
+        rows = await tracker.get_checkins_page(user_id, discord_id, cursors[-1], HISTORY_PAGE_SIZE + 1)
+        return rows[:HISTORY_PAGE_SIZE], len(rows) > HISTORY_PAGE_SIZE
+    
+    page, has_more = await load_page()
+    if not page:
+        await ctx.send("📜 No check-ins yet! Start with `!checkin` and your history will show up here.")
+        return
+    
+    history_msg = await ctx.send(embed=build_history_embed(page, len(cursors), has_more))
+    if not has_more:
+        return
+    
+    await history_msg.add_reaction("⬅️")
+    await history_msg.add_reaction("➡️")
+    
+    def check_reaction(reaction, user):
+        return (user == ctx.author and
+               str(reaction.emoji) in ["⬅️", "➡️"] and
+               reaction.message.id == history_msg.id)
+    
+    while True:
+        try:
+            reaction, _ = await bot.wait_for('reaction_add', timeout=HISTORY_TIMEOUT, check=check_reaction)
+        except asyncio.TimeoutError:
+            break
+        
+        emoji = str(reaction.emoji)
+        if emoji == "➡️" and has_more:
+            cursors.append(date.fromisoformat(page[-1]['date']))
+        elif emoji == "⬅️" and len(cursors) > 1:
+            cursors.pop()
+        else:
+            emoji = None
+        
+        if emoji:
+            page, has_more = await load_page()
+            await history_msg.edit(embed=build_history_embed(page, len(cursors), has_more))
+        
+        # Reset the reaction so it can be clicked again (needs Manage Messages in servers)
+        try:
+            await history_msg.remove_reaction(reaction.emoji, ctx.author)
+        except discord.HTTPException:
+            pass
+
+@bot.command(name='export')
+async def export(ctx, file_format: str = 'csv'):
+    """Export your full check-in history as a CSV or NDJSON file (sent via DM)"""
+    file_format = file_format.lower()
+    if file_format not in ('csv', 'ndjson'):
+        await ctx.send("❌ Unknown format! Use `!export csv` or `!export ndjson`")
+        return
+    
+    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    user_id = user.get('id', str(ctx.author.id))
+    
+    # Stream page by page into a temp file so memory stays flat whatever the history length
+    with tempfile.TemporaryFile() as buffer:
+        text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+        writer = csv.DictWriter(text, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        if file_format == 'csv':
+            writer.writeheader()
+        
+        total = 0
+        async for page in tracker.iter_checkins(user_id, str(ctx.author.id)):
+            for checkin in page:
+                if file_format == 'csv':
+                    writer.writerow(checkin)
+                else:
+                    text.write(json.dumps({field: checkin.get(field) for field in EXPORT_FIELDS}) + "\n")
+            total += len(page)
+        
+        text.flush()
+        text.detach()
+        buffer.seek(0)
+        
+        if total == 0:
+            await ctx.send("📦 Nothing to export yet! Start with `!checkin`.")
+            return
+        
+        filename = f"habitual-checkins-{date.today().isoformat()}.{file_format}"
+        try:
+            await ctx.author.send(
+                f"📦 Here's your full history: **{total}** check-ins.",
+                file=discord.File(buffer, filename=filename)
+            )
+            if ctx.guild:
+                await ctx.send("📬 Sent your export in DMs!")
+        except discord.Forbidden:
+            await ctx.send("❌ Couldn't DM you the export - are your DMs open?")
+
+@bot.command(name='import')
+async def import_history(ctx, mode: str = None):
+    """Import past check-ins from an attached CSV/JSON file (columns: date, mood, message)
+    
+    Examples:
+    !import              # Keep existing check-ins when dates overlap
+    !import overwrite    # Replace existing check-ins with the imported ones
+    """
+    if not ctx.message.attachments:
+        await ctx.send(
+            "📥 Attach a `.csv`, `.json` or `.ndjson` file to `!import`.\n\n"
+            "**Columns:** `date` (YYYY-MM-DD), `mood` (1-5, optional), `message` (optional)\n"
+            "Files from `!export` work as-is. Use `!import overwrite` to replace check-ins on overlapping dates."
+        )
+        return
+    
+    attachment = ctx.message.attachments[0]
+    file_format = detect_format(attachment.filename)
+    if not file_format:
+        await ctx.send("❌ Unsupported file type! Use `.csv`, `.json` or `.ndjson`")
+        return
+    if attachment.size > MAX_IMPORT_BYTES:
+        await ctx.send("❌ That file is too big! Split it into files under 25 MB.")
+        return
+    
+    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    user_id = user.get('id', str(ctx.author.id))
+    
+    progress_msg = await ctx.send(f"📥 Importing `{attachment.filename}`...")
+    last_update = monotonic()
+    
+    async def report_progress(read, imported):
+        nonlocal last_update
+        if monotonic() - last_update < IMPORT_PROGRESS_INTERVAL:
+            return
+        last_update = monotonic()
+        await progress_msg.edit(content=f"📥 Importing `{attachment.filename}`... {read} rows read, {imported} imported")
+    
+    # Spool to a temp file and parse it as a stream rather than holding it all in memory
+    with tempfile.TemporaryFile() as buffer:
+        await attachment.save(buffer)
+        buffer.seek(0)
+        stream = io.TextIOWrapper(buffer, encoding='utf-8-sig', newline='')
+        
+        try:
+            result = await tracker.import_checkins(
+                user_id,
+                str(ctx.author.id),
+                iter_import_rows(stream, file_format),
+                overwrite=(mode or '').lower() == 'overwrite',
+                progress=report_progress
+            )
+        except (UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+            await progress_msg.edit(content=f"❌ Couldn't read that file: {e}")
+            return
+    
+    if result['failed']:
+        response = f"❌ Import stopped partway - {result['imported']} check-ins were saved before the error. Running it again is safe."
+    else:
+        response = f"✅ **Imported {result['imported']} check-ins** from {result['read']} rows!"
+    
+    skipped = result['read'] - result['imported'] - result['invalid']
+    if skipped > 0 and not result['failed']:
+        response += f"\n↩️ {skipped} dates already had a check-in and were kept (use `!import overwrite` to replace them)"
+    if result['invalid']:
+        response += f"\n⚠️ {result['invalid']} rows were invalid:\n" + "\n".join(f"• {e}" for e in result['errors'])
+    
+    stats = await tracker.get_user_stats(user_id, str(ctx.author.id))
+    response += f"\n\n📊 Total: **{stats['total']}** · Current streak: **{stats['current_streak']}** · Best streak: **{stats['best_streak']}**"
+    await progress_msg.edit(content=response)
+
+@bot.command(name='leaderboard')
+async def leaderboard(ctx, metric: str = 'current'):
+    """Show this server's leaderboard (e.g., !leaderboard, !leaderboard best, !leaderboard consistency)"""
+    if not ctx.guild:
+        await ctx.send("🏆 Leaderboards are per server - try this in a server where I'm present!")
+        return
+    
+    metric_aliases = {'current': 'current', 'streak': 'current', 'best': 'best', 'consistency': 'consistency'}
+    metric = metric_aliases.get(metric.lower())
+    if not metric:
+        await ctx.send("❌ Pick one of: `!leaderboard current`, `!leaderboard best` or `!leaderboard consistency`")
+        return
+    
+    # Only reads the precomputed top-k, never storage
+    top = leaderboards.top(str(ctx.guild.id), metric)
+    if top is None:
+        await ctx.send("🏆 The leaderboard is still being tallied. Check back in a few minutes!")
+        return
+    
+    titles = {
+        'current': "🔥 Current Streaks",
+        'best': "🏔️ Best Streaks",
+        'consistency': f"📅 Consistency (last {CONSISTENCY_WINDOW} days)"
+    }
+    embed = discord.Embed(title=f"🏆 {titles[metric]}", color=0x22c55e)
+    
+    medals = ["🥇", "🥈", "🥉"]
+    lines = []
+    for rank, (discord_id, value) in enumerate(top, start=1):
+        badge = medals[rank - 1] if rank <= len(medals) else f"**{rank}.**"
+        shown = f"{value:.0f}%" if metric == 'consistency' else f"{value} days"
+        lines.append(f"{badge} <@{discord_id}> - {shown}")
+    embed.description = "\n".join(lines) or "Nobody's on the board yet. A single `!checkin` gets you there!"
+    
+    mine = leaderboards.user_entry(str(ctx.author.id))
+    if mine:
+        embed.add_field(
+            name="You",
+            value=f"🔥 {mine['current']} days · 🏔️ {mine['best']} days · 📅 {mine['consistency']:.0f}%",
+            inline=False
+        )
+    
+    updated = leaderboards.refreshed_at.strftime('%H:%M') if leaderboards.refreshed_at else "never"
+    embed.set_footer(text=f"Updated {updated} UTC · Everyone's pace is different, showing up is what counts 🌱")
+    await ctx.send(embed=embed)
+
+@bot.command(name='calendar')
+async def calendar(ctx):
+    """Show a year heatmap of your check-ins, shaded by mood"""
+    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    png = await tracker.get_calendar(user.get('id', str(ctx.author.id)), str(ctx.author.id), get_render_pool())
+    
+    if png is None:
+        await ctx.send("📅 No check-ins in the last year yet! Use `!checkin` to start filling your calendar.")
+        return
+    
+    embed = discord.Embed(
+        title="📅 Your Year of Check-ins",
+        description="Each square is a day, Monday on top. Grey = checked in without a mood, red → green = mood 1 → 5.",
+        color=0x22c55e
+    )
+    embed.set_image(url="attachment://calendar.png")
+    await ctx.send(embed=embed, file=discord.File(io.BytesIO(png), filename="calendar.png"))
+
+def format_mood_average(average: Optional[float]) -> str:
+    """Format an average mood like `3.6/5 😊`"""
+    if average is None:
+        return "no moods logged"
+    return f"{average:.1f}/5 {MOOD_EMOJIS[min(5, max(1, round(average)))]}"
+
+@bot.command(name='moodtrend')
+async def moodtrend(ctx):
+    """See how your mood has been trending (rolling averages, weekdays, streaks)"""
+    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    trends = await tracker.get_mood_trends(user.get('id', str(ctx.author.id)), str(ctx.author.id))
+    
+    if not trends:
+        await ctx.send("🎭 No moods logged yet! Add one to your check-in like `!checkin 4 good day` and trends will show up here.")
+        return
+    
+    embed = discord.Embed(title="🎭 Your Mood Trends", color=0x22c55e)
+    
+    averages = trends['averages']
+    embed.add_field(name="Last 7 days", value=format_mood_average(averages[7]), inline=True)
+    embed.add_field(name="Last 30 days", value=format_mood_average(averages[30]), inline=True)
+    embed.add_field(name="Last 90 days", value=format_mood_average(averages[90]), inline=True)
+    
+    weekday_lines = []
+    for name, average in zip(WEEKDAYS, trends['weekdays']):
+        if average is None:
+            weekday_lines.append(f"`{name}` ·")
+        else:
+            weekday_lines.append(f"`{name}` {'█' * round(average)}{'░' * (5 - round(average))} {average:.1f}")
+    embed.add_field(name="By weekday", value="\n".join(weekday_lines), inline=False)
+    
+    correlation = trends['correlation']
+    if correlation is None:
+        streak_text = "Not enough data yet - keep logging moods!"
+    elif correlation > 0.2:
+        streak_text = f"Your mood tends to lift the longer a streak runs (r = {correlation:.2f}) 📈"
+    elif correlation < -0.2:
+        streak_text = f"Longer streaks have lined up with lower moods (r = {correlation:.2f}). Rest days are allowed 💚"
+    else:
+        streak_text = f"No clear link between streak length and mood (r = {correlation:.2f})"
+    embed.add_field(name="Streaks & mood", value=streak_text, inline=False)
     
+    embed.set_footer(text=f"Based on {trends['mood_days']} check-ins with a mood")
     await ctx.send(embed=embed)
 
 @bot.command(name='reflect')
@@ -540,8 +1304,6 @@ async def reflect(ctx):
         return
     
     try:
-        client = openai.OpenAI(api_key=openai_key)
-        
         # Prepare context about user's habits
         context = f"""
         User stats:
@@ -557,16 +1319,10 @@ async def reflect(ctx):
             message = checkin.get('message', 'No message')
             context += f"- {date_str}: {message}\n"
         
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": DR_K_SYSTEM_PROMPT},
-                {"role": "user", "content": f"Give me some perspective on my habit tracking progress: {context}"}
-            ],
-            max_tokens=200
-        )
-        
-        reflection = response.choices[0].message.content
+        reflection, _ = await ai_router.complete('reflect', [
+            {"role": "system", "content": DR_K_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Give me some perspective on my habit tracking progress: {context}"}
+        ])
         await ctx.send(f"🤖 **Reflection:**\n{reflection}")
         
     except Exception as e:
@@ -583,18 +1339,10 @@ async def rewrite(ctx, *, text: str):
         return
     
     try:
-        client = openai.OpenAI(api_key=openai_key)
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": DR_K_SYSTEM_PROMPT + "\n\nReframe the user's negative self-talk in a more compassionate, realistic way. Don't dismiss their feelings, but help them see a more balanced perspective."},
-                {"role": "user", "content": f"Help me reframe this thought: {text}"}
-            ],
-            max_tokens=150
-        )
-        
-        reframed = response.choices[0].message.content
+        reframed, _ = await ai_router.complete('rewrite', [
+            {"role": "system", "content": DR_K_SYSTEM_PROMPT + "\n\nReframe the user's negative self-talk in a more compassionate, realistic way. Don't dismiss their feelings, but help them see a more balanced perspective."},
+            {"role": "user", "content": f"Help me reframe this thought: {text}"}
+        ])
         await ctx.send(f"🤖 **Reframed:**\n{reframed}")
         
     except Exception as e:
@@ -611,18 +1359,10 @@ async def idea(ctx):
         return
     
     try:
-        client = openai.OpenAI(api_key=openai_key)
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": DR_K_SYSTEM_PROMPT + "\n\nSuggest a small, actionable habit-building idea. Keep it simple and achievable. Focus on tiny steps that build momentum."},
-                {"role": "user", "content": "Give me a small idea for building better habits or self-care."}
-            ],
-            max_tokens=150
-        )
-        
-        suggestion = response.choices[0].message.content
+        suggestion, _ = await ai_router.complete('idea', [
+            {"role": "system", "content": DR_K_SYSTEM_PROMPT + "\n\nSuggest a small, actionable habit-building idea. Keep it simple and achievable. Focus on tiny steps that build momentum."},
+            {"role": "user", "content": "Give me a small idea for building better habits or self-care."}
+        ])
         await ctx.send(f"💡 **Small idea:**\n{suggestion}")
         
     except Exception as e:
@@ -640,7 +1380,7 @@ async def commands_list(ctx):
     
     embed.add_field(
         name="📝 Basic Commands",
-        value="`!checkin [mood] [message]` - Log today's check-in\n`!summary` - View your stats and recent entries\n`!timezone [zone]` - Set your timezone (resets at local midnight)\n`!remindme 20:00 CET` - Set daily reminder with timezone\n`!stopreminder` - Turn off reminders",
+        value="`!checkin [mood] [message]` - Log today's check-in\n`!summary` - View your stats and recent entries\n`!history` - Browse all your check-ins\n`!moodtrend` - See how your mood is trending\n`!calendar` - Year heatmap of your check-ins\n`!export [csv|ndjson]` - Download your full history\n`!import` - Import past check-ins from an attached file\n`!leaderboard [current|best|consistency]` - See this server's streaks\n`!timezone [zone]` - Set your timezone (resets at local midnight)\n`!remindme 20:00 CET` - Set daily reminder with timezone\n`!stopreminder` - Turn off reminders",
         inline=False
     )
     
@@ -669,22 +1409,19 @@ async def set_timezone(ctx, *, timezone_str: str = None):
     """Set your timezone for proper check-in timing (e.g., !timezone CET or !timezone Europe/Stockholm)"""
     if not timezone_str:
         # Show current timezone
-        user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+        await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
         
-        if not USE_LOCAL_ONLY and supabase:
-            try:
-                result = supabase.table('users').select('timezone').eq('discord_id', str(ctx.author.id)).execute()
-                if result.data and result.data[0].get('timezone'):
-                    current_tz = result.data[0]['timezone']
-                    user_tz = pytz.timezone(current_tz)
-                    now_local = datetime.now(user_tz)
-                    await ctx.send(f"🌍 Your timezone: **{current_tz}**\nLocal time: **{now_local.strftime('%Y-%m-%d %H:%M')}**\n\nCheck-ins reset at midnight in your local time! 🕛")
-                else:
-                    await ctx.send("🌍 No timezone set. Using UTC (server time).\n\nSet your timezone with: `!timezone Europe/Stockholm` or `!timezone CET`")
-            except Exception as e:
-                await ctx.send("🌍 No timezone set. Using UTC (server time).\n\nSet your timezone with: `!timezone Europe/Stockholm` or `!timezone CET`")
-        else:
-            await ctx.send("🌍 Local mode - using server timezone.\n\nSet your timezone with: `!timezone Europe/Stockholm` or `!timezone CET`")
+        try:
+            current_tz = await tracker.get_user_timezone(str(ctx.author.id))
+            if current_tz:
+                user_tz = pytz.timezone(current_tz)
+                now_local = datetime.now(user_tz)
+                await ctx.send(f"🌍 Your timezone: **{current_tz}**\nLocal time: **{now_local.strftime('%Y-%m-%d %H:%M')}**\n\nCheck-ins reset at midnight in your local time! 🕛")
+                return
+        except Exception as e:
+            print(f"Error getting user timezone: {e}")
+        
+        await ctx.send("🌍 No timezone set. Using UTC (server time).\n\nSet your timezone with: `!timezone Europe/Stockholm` or `!timezone CET`")
         return
     
     # Timezone mapping for common abbreviations
@@ -725,15 +1462,8 @@ async def set_timezone(ctx, *, timezone_str: str = None):
             return
     
     # Store timezone for user
-    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
-    
-    if not USE_LOCAL_ONLY and supabase:
-        try:
-            supabase.table('users').update({
-                'timezone': tz_name
-            }).eq('discord_id', str(ctx.author.id)).execute()
-        except Exception as e:
-            print(f"Database error updating timezone: {e}")
+    await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    await tracker.set_timezone(str(ctx.author.id), tz_name)
     
     # Show confirmation with local time
     now_local = datetime.now(user_tz)
@@ -794,17 +1524,8 @@ async def set_reminder(ctx, reminder_time: str = None, timezone_str: str = "UTC"
         utc_time = local_time.astimezone(pytz.UTC).time()
         
         # Store reminder time and timezone for user
-        user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
-        
-        if not USE_LOCAL_ONLY and supabase:
-            try:
-                # Update user's reminder time and timezone in database
-                supabase.table('users').update({
-                    'reminder_time': utc_time.isoformat(),
-                    'timezone': str(user_tz)
-                }).eq('discord_id', str(ctx.author.id)).execute()
-            except Exception as e:
-                print(f"Database error updating reminder: {e}")
+        await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+        await tracker.set_reminder(str(ctx.author.id), utc_time, str(user_tz))
         
         # Format display time
         display_time = f"{hour:02d}:{minute:02d}"
@@ -820,36 +1541,105 @@ async def set_reminder(ctx, reminder_time: str = None, timezone_str: str = "UTC"
 @bot.command(name='stopreminder')
 async def stop_reminder(ctx):
     """Stop daily reminders"""
-    user = await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    await tracker.get_or_create_user(str(ctx.author.id), str(ctx.author))
+    await tracker.clear_reminder(str(ctx.author.id))
     
-    if not USE_LOCAL_ONLY and supabase:
+    await ctx.send("🔕 Daily reminders stopped. You can set them again with `!remindme HH:MM`")
+
+@bot.command(name='profile')
+@commands.is_owner()
+async def profile(ctx, seconds: int = 30):
+    """Owner only: sample the event loop for N seconds and DM a collapsed-stack profile"""
+    if profile_lock.locked():
+        await ctx.send("🔬 A profile is already running, hang tight!")
+        return
+    
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+    
+    async with profile_lock:
+        await ctx.send(f"🔬 Profiling the event loop for {seconds}s...")
+        
+        # Sample from a worker thread so the loop keeps serving commands meanwhile
+        profiler = SamplingProfiler(loop_monitor.loop_thread_id or threading.get_ident())
+        await asyncio.to_thread(profiler.run, seconds)
+        
+        report = profiler.to_collapsed()
+        stalls = list(loop_monitor.recent_stalls)
+        filename = f"profile-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.collapsed"
+        
+        summary_text = f"🔬 **Profile done:** {profiler.sample_count} samples over {seconds}s, {len(stalls)} recent loop stalls"
+        if stalls:
+            worst = max(stalls, key=lambda s: s['duration_ms'])
+            summary_text += f" (worst: {worst['duration_ms']}ms)"
+        summary_text += "\nFeed the file to `flamegraph.pl` or drop it into speedscope.app"
+        
         try:
-            # Remove reminder time from database
-            supabase.table('users').update({
-                'reminder_time': None
-            }).eq('discord_id', str(ctx.author.id)).execute()
-        except Exception as e:
-            print(f"Database error removing reminder: {e}")
+            await ctx.author.send(
+                summary_text,
+                file=discord.File(io.BytesIO(report.encode('utf-8')), filename=filename)
+            )
+        except discord.Forbidden:
+            await ctx.send("❌ Couldn't DM you the profile - are your DMs open?")
+
+@bot.command(name='stats')
+@commands.is_owner()
+async def community_stats(ctx, days: int = STATS_DEFAULT_DAYS):
+    """Owner only: community-wide check-ins, moods and reminder conversion for the last N days"""
+    days = max(1, min(days, STATS_MAX_DAYS))
+    stats = await collect_stats(days)
     
-    await ctx.send("🔕 Daily reminders stopped. You can set them again with `!remindme HH:MM`")
+    if not stats['days']:
+        await ctx.send(f"📊 No check-ins in the last {days} days yet.")
+        return
+    
+    lines = []
+    for day in reversed(stats['days']):
+        mood = f"{day['average_mood']:.1f}" if day['average_mood'] is not None else "  - "
+        reminders = f"{day['reminder_checkins']}/{day['reminders_sent']}" if day['reminders_sent'] else "-"
+        lines.append(f"{day['date']}  {day['checkins']:>5}  {mood:>4}  {reminders:>7}")
+    
+    embed = discord.Embed(
+        title=f"📊 Community Stats - last {days} days",
+        description="```\nday         checks  mood  reminded\n" + "\n".join(lines) + "\n```",
+        color=0x22c55e
+    )
+    embed.add_field(name="Check-ins", value=f"{stats['checkins']:,}", inline=True)
+    if stats['average_mood'] is not None:
+        embed.add_field(name="Average mood", value=f"{stats['average_mood']:.2f}/5", inline=True)
+    if stats['reminder_conversion'] is not None:
+        embed.add_field(
+            name="Reminder conversion",
+            value=f"{stats['reminder_conversion']:.0%} ({stats['reminder_checkins']}/{stats['reminders_sent']})",
+            inline=True
+        )
+    histogram = " ".join(f"{MOOD_EMOJIS[mood]} {count}" for mood, count in enumerate(stats['mood_histogram'], start=1))
+    embed.add_field(name="Moods", value=histogram, inline=False)
+    await ctx.send(embed=embed)
+
+@profile.error
+@community_stats.error
+async def owner_command_error(ctx, error):
+    if isinstance(error, commands.NotOwner):
+        await ctx.send("🔒 That command is for the bot owner only.")
+    else:
+        print(f"{ctx.command} command error: {error}")
 
 @tasks.loop(minutes=30)  # Check every 30 minutes
 async def daily_reminder_check():
     """Check if users need reminders"""
-    if USE_LOCAL_ONLY:
-        return  # Skip reminders in local mode for now
-    
     try:
-        current_time = datetime.utcnow().time()
-        current_date = date.today()
+        now = datetime.utcnow()
+        current_time = now.time()
         
         # Get users who have reminder times set
-        result = supabase.table('users').select('*').not_.is_('reminder_time', 'null').execute()
+        users = await tracker.get_users_with_reminders()
+        due = {}  # discord_id -> user_id
         
-        for user_data in result.data:
+        for user_data in users:
             user_id = user_data['id']
             discord_id = user_data['discord_id']
             reminder_time_str = user_data['reminder_time']
+            tracker.timezones.set_zone(discord_id, user_data.get('timezone'))
             
             if not reminder_time_str:
                 continue
@@ -858,54 +1648,137 @@ async def daily_reminder_check():
             reminder_time = datetime.fromisoformat(f"1900-01-01T{reminder_time_str}").time()
             
             # Check if it's time to remind (within 30 minutes of reminder time)
-            time_diff = datetime.combine(current_date, current_time) - datetime.combine(current_date, reminder_time)
+            time_diff = datetime.combine(now.date(), current_time) - datetime.combine(now.date(), reminder_time)
             
             if abs(time_diff.total_seconds()) <= 1800:  # Within 30 minutes
-                # Check if user has already checked in today
-                checkin_result = supabase.table('checkins').select('*').eq('user_id', user_id).eq('date', current_date.isoformat()).execute()
+                due[discord_id] = user_id
+        
+        # "Today" is the user's local date - resolved and checked once per timezone, not per user
+        local_dates = tracker.timezones.local_dates()
+        reminders_sent = Counter()
+        
+        for zone, discord_ids in tracker.timezones.group(due).items():
+            zone_today = local_dates.get(zone) or TimezoneIndex.local_date(zone)
+            try:
+                checked_in = await tracker.get_checked_in({due[d]: d for d in discord_ids}, zone_today)
+            except Exception as e:
+                # Without knowing who checked in, a reminder could nag people who already did
+                print(f"Error checking {zone} check-ins, skipping its reminders: {e}")
+                continue
+            
+            for discord_id in discord_ids:
+                if discord_id in checked_in:  # Already checked in today
+                    continue
                 
-                if not checkin_result.data:  # No checkin today
-                    # Send reminder DM
-                    try:
-                        discord_user = await bot.fetch_user(int(discord_id))
-                        
-                        embed = discord.Embed(
-                            title="🌱 Gentle Reminder",
-                            description="Hey there! Just checking in - you haven't logged your daily check-in yet.",
-                            color=0x22c55e
-                        )
-                        embed.add_field(
-                            name="Quick Check-in",
-                            value="Just type `!checkin` in any server where I'm present, or add a message like `!checkin had a good day!`",
-                            inline=False
-                        )
-                        embed.add_field(
-                            name="Remember",
-                            value="Consistency isn't about perfection. Even checking in with 'struggled today' counts as showing up. 💚",
-                            inline=False
-                        )
-                        embed.set_footer(text="Use !stopreminder if you want to turn these off")
-                        
-                        await discord_user.send(embed=embed)
-                        print(f"Sent reminder to {discord_user.name}")
-                        
-                    except discord.Forbidden:
-                        print(f"Couldn't send DM to user {discord_id} - DMs disabled")
-                    except discord.NotFound:
-                        print(f"User {discord_id} not found")
-                    except Exception as e:
-                        print(f"Error sending reminder to {discord_id}: {e}")
+                # Send reminder DM
+                try:
+                    discord_user = await bot.fetch_user(int(discord_id))
+                    
+                    embed = discord.Embed(
+                        title="🌱 Gentle Reminder",
+                        description="Hey there! Just checking in - you haven't logged your daily check-in yet.",
+                        color=0x22c55e
+                    )
+                    embed.add_field(
+                        name="Quick Check-in",
+                        value="Just type `!checkin` in any server where I'm present, or add a message like `!checkin had a good day!`",
+                        inline=False
+                    )
+                    embed.add_field(
+                        name="Remember",
+                        value="Consistency isn't about perfection. Even checking in with 'struggled today' counts as showing up. 💚",
+                        inline=False
+                    )
+                    embed.set_footer(text="Use !stopreminder if you want to turn these off")
+                    
+                    await discord_user.send(embed=embed)
+                    print(f"Sent reminder to {discord_user.name}")
+                    if tracker.note_reminder_sent(discord_id):
+                        reminders_sent[zone_today] += 1
+                    
+                except discord.Forbidden:
+                    print(f"Couldn't send DM to user {discord_id} - DMs disabled")
+                except discord.NotFound:
+                    print(f"User {discord_id} not found")
+                except Exception as e:
+                    print(f"Error sending reminder to {discord_id}: {e}")
+        
+        for day, count in reminders_sent.items():
+            await tracker.record_reminders_sent(day, count)
                         
     except Exception as e:
         print(f"Error in reminder check: {e}")
 
+async def rebuild_leaderboards(guild_ids: list):
+    """Rebuild the leaderboards of the given servers in one bulk streak pass
+    
+    Raises if a storage read fails, leaving the current boards in place.
+    """
+    guild_members = {}
+    for guild_id in guild_ids:
+        guild_members[guild_id] = await tracker.get_guild_members(guild_id)
+    
+    discord_ids = sorted({m for members in guild_members.values() for m in members})
+    days_by_user = await tracker.get_day_ordinals(discord_ids)
+    
+    # Streaks are relative to each member's local today, worked out once per timezone
+    local_dates = {zone: day.toordinal() for zone, day in tracker.timezones.local_dates().items()}
+    
+    def member_today(discord_id: str) -> int:
+        return local_dates.get(tracker.timezones.zone_of(discord_id) or DEFAULT_ZONE, local_dates[DEFAULT_ZONE])
+    
+    # Vectorized, but can still take a moment for big populations - keep it off the loop
+    await asyncio.to_thread(leaderboards.rebuild, guild_members, days_by_user, member_today)
+
+@tasks.loop(minutes=LEADERBOARD_REFRESH_MINUTES)
+async def refresh_leaderboards():
+    """Periodically re-rank every server the bot is in"""
+    try:
+        await rebuild_leaderboards([str(guild.id) for guild in bot.guilds])
+    except Exception as e:
+        print(f"Error refreshing leaderboards: {e}")
+
+@tasks.loop(minutes=1)
+async def streak_expiry_sweep():
+    """At each timezone's midnight, expire the streaks of its users that just broke"""
+    try:
+        for zone, today in tracker.timezones.advance():
+            discord_ids = tracker.timezones.zones.get(zone, set())
+            expired = tracker.expire_streaks(discord_ids, today)
+            expired_ranked = leaderboards.expire_streaks(discord_ids, today.toordinal())
+            if expired or expired_ranked:
+                print(f"🕛 Midnight in {zone}: expired {max(expired, expired_ranked)} streaks")
+    except Exception as e:
+        print(f"Error in streak expiry sweep: {e}")
+
+@tasks.loop(minutes=10)
+async def purge_caches():
+    """Evict expired cache entries so memory follows active users, not every user ever seen"""
+    try:
+        tracker.purge_expired()
+    except Exception as e:
+        print(f"Error purging caches: {e}")
+
+@refresh_leaderboards.before_loop
+async def before_leaderboard_refresh():
+    await bot.wait_until_ready()
+
+@streak_expiry_sweep.before_loop
+async def before_streak_sweep():
+    await bot.wait_until_ready()
+
 @daily_reminder_check.before_loop
 async def before_reminder_check():
     await bot.wait_until_ready()
 
+@purge_caches.before_loop
+async def before_cache_purge():
+    await bot.wait_until_ready()
+
 if __name__ == "__main__":
     if not DISCORD_TOKEN:
         print("❌ DISCORD_TOKEN not found in environment variables!")
         exit(1)
     
-    bot.run(DISCORD_TOKEN) 
\ No newline at end of file
+    bot.run(DISCORD_TOKEN)
+    save_state_snapshot() 
\ No newline at end of file
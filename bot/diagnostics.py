@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+
+def _frame_label(frame) -> str:
+    """Format a frame as a stable flamegraph label (function + definition site)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Turn a frame into a root-first, semicolon separated collapsed stack"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class LoopStallMonitor:
+    """Detects event loop stalls and captures the stack that blocked the loop
+
+    A heartbeat coroutine ticks every `interval` seconds on the loop. A daemon
+    watchdog thread notices when the heartbeat goes quiet for longer than
+    `threshold` seconds and grabs the loop thread's current stack while the
+    blocking call is still running, so the report points at the actual culprit.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1, history: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.recent_stalls = deque(maxlen=history)
+        self.loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._pending: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start monitoring the running event loop (call from inside the loop)"""
+        if self.running:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-stall-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+
+            pending = self._pending
+            if pending is not None:
+                # Loop is responsive again - finalize the stall report
+                self._pending = None
+                pending['duration_ms'] = round((now - expected) * 1000)
+                self.recent_stalls.append(pending)
+                print(f"⚠️ Event loop stalled for {pending['duration_ms']}ms, blocked in:\n{pending['stack']}")
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue <= self.threshold or self._pending is not None:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            self._pending = {
+                'detected_at': datetime.utcnow().isoformat(),
+                'stack': ''.join(traceback.format_stack(frame)) if frame else '<no frame>',
+                'collapsed': collapse_stack(frame) if frame else '',
+            }
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into collapsed-stack counts
+
+    Run `run()` in a worker thread; the output of `to_collapsed()` can be fed
+    straight into flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+
+    def run(self, duration: float) -> Counter:
+        """Sample the target thread for `duration` seconds (blocking)"""
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+                self.sample_count += 1
+            del frame
+            time.sleep(self.interval)
+        return self.samples
+
+    def to_collapsed(self) -> str:
+        """Render samples in Brendan Gregg's collapsed-stack format"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
@@ -0,0 +1,82 @@
+import struct
+import zlib
+from typing import Optional
+
+CALENDAR_WEEKS = 53
+CELL_SIZE = 12
+CELL_GAP = 3
+MARGIN = 10
+
+# Palette indexes - the image is a palette PNG, one byte per pixel
+BACKGROUND = 0
+EMPTY = 1
+NO_MOOD = 2
+PALETTE = [
+    (13, 17, 23),     # background
+    (33, 38, 45),     # no check-in
+    (110, 118, 129),  # check-in without a mood
+    (127, 29, 29),    # mood 1
+    (194, 65, 12),    # mood 2
+    (202, 138, 4),    # mood 3
+    (101, 163, 13),   # mood 4
+    (34, 197, 94),    # mood 5
+]
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(width: int, height: int, rows: list, palette: list) -> bytes:
+    """Encode 8-bit palette rows (one bytes object per scanline) as a PNG"""
+    header = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    # Filter type 0 (none) in front of every scanline
+    raw = b''.join(b'\x00' + row for row in rows)
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _chunk(b'IHDR', header),
+        _chunk(b'PLTE', bytes(channel for color in palette for channel in color)),
+        _chunk(b'IDAT', zlib.compress(raw, 6)),
+        _chunk(b'IEND', b''),
+    ))
+
+
+def cell_color(day: int, cells: dict, today: int) -> int:
+    """Palette index for one day ordinal"""
+    if day > today:
+        return BACKGROUND
+    if day not in cells:
+        return EMPTY
+    mood: Optional[int] = cells[day]
+    return NO_MOOD + mood if mood else NO_MOOD
+
+
+def render_heatmap(cells: dict, today: int, weeks: int = CALENDAR_WEEKS) -> bytes:
+    """Render a year heatmap PNG, one column per week and one row per weekday
+
+    `cells` maps day ordinals to the mood logged that day (None without a
+    mood). The last column is the week containing `today`, Monday on top.
+    Pure function of its arguments so it can run in a worker process.
+    """
+    # Ordinal 1 was a Monday, so (day - 1) % 7 is the weekday
+    first_day = today - (today - 1) % 7 - (weeks - 1) * 7
+    width = MARGIN * 2 + weeks * CELL_SIZE + (weeks - 1) * CELL_GAP
+    height = MARGIN * 2 + 7 * CELL_SIZE + 6 * CELL_GAP
+
+    margin_row = bytes(width)
+    gap_row = bytes(width)
+    side = bytes(MARGIN)
+    gap = bytes(CELL_GAP)
+
+    rows = [margin_row] * MARGIN
+    for weekday in range(7):
+        # Build one scanline per weekday and repeat it for the cell's height
+        segments = [bytes((cell_color(first_day + week * 7 + weekday, cells, today),)) * CELL_SIZE
+                    for week in range(weeks)]
+        scanline = side + gap.join(segments) + side
+        rows.extend([scanline] * CELL_SIZE)
+        if weekday < 6:
+            rows.extend([gap_row] * CELL_GAP)
+    rows.extend([margin_row] * MARGIN)
+
+    return encode_png(width, height, rows, PALETTE)
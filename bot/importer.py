@@ -0,0 +1,96 @@
+import csv
+import json
+from datetime import date
+from typing import Iterator, Optional, Tuple
+
+MAX_MESSAGE_LENGTH = 2000
+MIN_IMPORT_DATE = date(1970, 1, 1)
+IMPORT_FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Guess the import format from an attachment's file name"""
+    for extension, file_format in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    return None
+
+
+def iter_import_rows(stream, file_format: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw row) pairs from a text stream
+
+    CSV and NDJSON are read one line at a time. A `.json` file may hold either
+    NDJSON or a single JSON array; arrays have to be decoded in one go, which is
+    fine for attachment-sized files.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {(k or '').strip().lower(): v for k, v in row.items()}
+        return
+
+    first_line = stream.readline()
+    if file_format == 'json' and first_line.lstrip().startswith('['):
+        rows = json.loads(first_line + stream.read())
+        for index, row in enumerate(rows, start=1):
+            yield index, row if isinstance(row, dict) else {}
+        return
+
+    line_no = 1
+    line = first_line
+    while line:
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = {'_error': 'not valid JSON'}
+            yield line_no, row if isinstance(row, dict) else {}
+        line = stream.readline()
+        line_no += 1
+
+
+class CheckinValidator:
+    """Validates import rows against the `checkins` table constraints"""
+
+    def __init__(self, today: date):
+        self.today = today
+        self.seen_dates = set()
+
+    def validate(self, row: dict) -> Tuple[Optional[dict], Optional[str]]:
+        """Return (checkin, None) for a valid row or (None, reason) otherwise"""
+        if row.get('_error'):
+            return None, row['_error']
+
+        raw_date = str(row.get('date') or '').strip()
+        try:
+            day = date.fromisoformat(raw_date[:10])
+        except ValueError:
+            return None, f"invalid date `{raw_date or 'missing'}` (use YYYY-MM-DD)"
+
+        if day > self.today:
+            return None, f"{day.isoformat()} is in the future"
+        if day < MIN_IMPORT_DATE:
+            return None, f"{day.isoformat()} is before {MIN_IMPORT_DATE.isoformat()}"
+        if day in self.seen_dates:
+            return None, f"{day.isoformat()} appears more than once"
+
+        mood = row.get('mood')
+        if mood in (None, ''):
+            mood = None
+        else:
+            # Whole numbers only - "3.7", "inf" or true aren't moods
+            raw_mood = str(mood).strip()
+            if isinstance(mood, bool) or not raw_mood.lstrip('+-').isdigit():
+                return None, f"mood `{mood}` is not a whole number"
+            try:
+                mood = int(raw_mood)
+            except (ValueError, OverflowError):
+                return None, f"mood `{mood}` is not a whole number"
+            if not 1 <= mood <= 5:
+                return None, f"mood {mood} is outside 1-5"
+
+        message = row.get('message')
+        message = str(message).strip()[:MAX_MESSAGE_LENGTH] if message not in (None, '') else None
+
+        self.seen_dates.add(day)
+        return {'date': day.isoformat(), 'mood': mood, 'message': message or None}, None
@@ -0,0 +1,67 @@
+import json
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+
+def format_prometheus(metrics: list) -> str:
+    """Render metrics in the Prometheus text format
+
+    `metrics` is a list of (name, type, help, samples) where samples are
+    (labels dict, value) pairs. Samples with a None value are skipped.
+    """
+    lines = []
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Tiny HTTP server for dashboards and scrapers, runs on the bot's event loop
+
+    `GET /metrics` serves `collect_metrics()` in Prometheus format and
+    `GET /stats.json?days=N` serves `collect_stats(days)` as JSON.
+    """
+
+    def __init__(self, port: int, collect_metrics: Callable[[], Awaitable[list]],
+                 collect_stats: Callable[[int], Awaitable[dict]], host: str = '0.0.0.0', max_days: int = 365):
+        self.port = port
+        self.host = host
+        self.max_days = max_days
+        self.collect_metrics = collect_metrics
+        self.collect_stats = collect_stats
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        if self.runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        app.router.add_get('/stats.json', self._stats)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        text = format_prometheus(await self.collect_metrics())
+        return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        try:
+            days = int(request.query.get('days', '30'))
+        except ValueError:
+            raise web.HTTPBadRequest(text="days must be a number")
+        days = max(1, min(days, self.max_days))
+        return web.Response(text=json.dumps(await self.collect_stats(days)), content_type='application/json')
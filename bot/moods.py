@@ -0,0 +1,194 @@
+import math
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional
+
+import numpy as np
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Days of history kept per series, counted back from the latest check-in. Arrays
+# are sized to the span, so one ancient row can't blow up memory or rebuild time
+MOOD_HISTORY_DAYS = 2 * 366
+
+
+def weekday_of(day: int) -> int:
+    """Weekday (Monday = 0) of a `date.toordinal()` day - ordinal 1 was a Monday"""
+    return (day - 1) % 7
+
+
+class MoodSeries:
+    """One user's daily mood rollup with prefix sums indexed by day ordinal
+
+    `rows` maps day ordinal -> mood (None for check-ins without a mood). Prefix
+    sums and counts make any window average O(1). Weekday buckets and the
+    running sums behind the streak/mood correlation are kept alongside, so a
+    new check-in at the end of the series is folded in without a rebuild.
+    Rows more than MOOD_HISTORY_DAYS before the latest one are dropped.
+    """
+
+    def __init__(self, rows: dict):
+        self.rows = dict(rows)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.end = max(self.rows) if self.rows else -1
+        self.start = min(self.rows) if self.rows else 0
+        if self.start <= self.end - MOOD_HISTORY_DAYS:
+            self.start = self.end - MOOD_HISTORY_DAYS + 1
+            self.rows = {day: mood for day, mood in self.rows.items() if day >= self.start}
+        size = self.end - self.start + 1
+
+        days = np.fromiter(self.rows.keys(), dtype=np.int64, count=len(self.rows)) - self.start
+        values = np.fromiter((mood or 0 for mood in self.rows.values()), dtype=np.int64, count=len(self.rows))
+        moods = np.zeros(size, dtype=np.int64)
+        moods[days] = values
+        has_mood = (moods > 0).astype(np.int64)
+        checked_in = np.zeros(size, dtype=bool)
+        checked_in[days] = True
+
+        # Prefix arrays have one extra leading zero: sum of [i, j) = S[j] - S[i]
+        self.mood_sums = np.concatenate(([0], np.cumsum(moods)))
+        self.mood_counts = np.concatenate(([0], np.cumsum(has_mood)))
+
+        # Streak position of every day: 1 on the first day of a run, 2 on the next...
+        # i.e. the distance to the last day without a check-in (or to before the start)
+        index = np.arange(size, dtype=np.int64)
+        last_gap = np.maximum.accumulate(np.where(checked_in, -1, index))
+        self.positions = np.where(checked_in, index - last_gap, 0)
+
+        weekdays = (np.arange(self.start, self.end + 1) - 1) % 7
+        self.weekday_sums = np.bincount(weekdays, weights=moods, minlength=7)
+        self.weekday_counts = np.bincount(weekdays, weights=has_mood, minlength=7)
+
+        mask = has_mood.astype(bool)
+        x = self.positions[mask].astype(np.float64)
+        y = moods[mask].astype(np.float64)
+        self.corr = {
+            'n': int(mask.sum()), 'sx': x.sum(), 'sy': y.sum(),
+            'sxy': (x * y).sum(), 'sxx': (x * x).sum(), 'syy': (y * y).sum()
+        }
+
+    def _add_pair(self, x: int, y: int, sign: int = 1):
+        c = self.corr
+        c['n'] += sign
+        c['sx'] += sign * x
+        c['sy'] += sign * y
+        c['sxy'] += sign * x * y
+        c['sxx'] += sign * x * x
+        c['syy'] += sign * y * y
+
+    def record(self, day: int, mood: Optional[int]):
+        """Fold one check-in (new or updated) into the rollup"""
+        if self.rows and day <= self.end - MOOD_HISTORY_DAYS:
+            return  # Older than the history kept
+        if not self.rows or day < self.start or (day < self.end and day not in self.rows):
+            # Back-filling a gap shifts later streak positions - rebuild instead
+            self.rows[day] = mood
+            self._rebuild()
+            return
+
+        if day > self.end:
+            # Extend every prefix array to the new day, gap days contribute nothing
+            gap = day - self.end
+            self.mood_sums = np.concatenate((self.mood_sums, np.full(gap, self.mood_sums[-1])))
+            self.mood_counts = np.concatenate((self.mood_counts, np.full(gap, self.mood_counts[-1])))
+            position = self.positions[-1] + 1 if gap == 1 and len(self.positions) else 1
+            self.positions = np.concatenate((self.positions, np.zeros(gap - 1, dtype=np.int64), [position]))
+            self.end = day
+            old = None
+        else:
+            old = self.rows.get(day)
+
+        self.rows[day] = mood
+        index = day - self.start
+        position = int(self.positions[index])
+        weekday = weekday_of(day)
+
+        if old:
+            self.mood_sums[index + 1:] -= old
+            self.mood_counts[index + 1:] -= 1
+            self.weekday_sums[weekday] -= old
+            self.weekday_counts[weekday] -= 1
+            self._add_pair(position, old, -1)
+        if mood:
+            self.mood_sums[index + 1:] += mood
+            self.mood_counts[index + 1:] += 1
+            self.weekday_sums[weekday] += mood
+            self.weekday_counts[weekday] += 1
+            self._add_pair(position, mood)
+
+    def window_average(self, today: int, days: int) -> Optional[float]:
+        """Average mood over the `days` days ending with `today`, O(1)"""
+        size = len(self.mood_sums) - 1
+        lo = min(max(today - days + 1 - self.start, 0), size)
+        hi = min(max(today + 1 - self.start, 0), size)
+        count = self.mood_counts[hi] - self.mood_counts[lo]
+        if count == 0:
+            return None
+        return float(self.mood_sums[hi] - self.mood_sums[lo]) / count
+
+    def weekday_averages(self) -> list:
+        """Average mood per weekday, Monday first (None where there's no data)"""
+        return [
+            float(self.weekday_sums[i] / self.weekday_counts[i]) if self.weekday_counts[i] else None
+            for i in range(7)
+        ]
+
+    def streak_mood_correlation(self) -> Optional[float]:
+        """Pearson correlation between streak length on a day and that day's mood"""
+        c = self.corr
+        n = c['n']
+        if n < 3:
+            return None
+        denominator = (n * c['sxx'] - c['sx'] ** 2) * (n * c['syy'] - c['sy'] ** 2)
+        if denominator <= 0:
+            return None
+        return float((n * c['sxy'] - c['sx'] * c['sy']) / math.sqrt(denominator))
+
+
+class MoodIndex:
+    """LRU of per-user MoodSeries, loaded on first use and updated on writes
+
+    Writes made through the bot are folded in, but other clients can write
+    behind its back, so with `ttl` a series is reloaded once it is that many
+    seconds old.
+    """
+
+    def __init__(self, max_users: int = 10000, ttl: Optional[float] = None):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.series = OrderedDict()  # discord_id -> (expires, series)
+
+    def get(self, discord_id: str) -> Optional[MoodSeries]:
+        entry = self.series.get(discord_id)
+        if entry is None:
+            return None
+        if entry[0] <= monotonic():
+            del self.series[discord_id]
+            return None
+        self.series.move_to_end(discord_id)
+        return entry[1]
+
+    def put(self, discord_id: str, series: MoodSeries):
+        expires = monotonic() + self.ttl if self.ttl is not None else math.inf
+        self.series[discord_id] = (expires, series)
+        self.series.move_to_end(discord_id)
+        while len(self.series) > self.max_users:
+            self.series.popitem(last=False)
+
+    def record(self, discord_id: str, day: int, mood: Optional[int]):
+        """Apply a write to an already loaded series (unloaded users load fresh later)"""
+        entry = self.series.get(discord_id)
+        if entry is not None:
+            entry[1].record(day, mood)
+
+    def invalidate(self, discord_id: str):
+        self.series.pop(discord_id, None)
+
+    def purge_expired(self) -> int:
+        """Drop series past their TTL, returns how many"""
+        now = monotonic()
+        expired = [d for d, (expires, _) in self.series.items() if expires <= now]
+        for discord_id in expired:
+            del self.series[discord_id]
+        return len(expired)
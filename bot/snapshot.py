@@ -0,0 +1,60 @@
+import gzip
+import json
+import os
+import time
+from typing import Optional
+
+SNAPSHOT_VERSION = 2
+
+
+def save_snapshot(path: str, storage_name: str, state: dict):
+    """Write hot state to a gzipped JSON file, atomically
+
+    The file is written next to `path` and renamed over it, so a crash
+    mid-write leaves the previous snapshot (or none) rather than half a file.
+    """
+    payload = {
+        'version': SNAPSHOT_VERSION,
+        'storage': storage_name,
+        'saved_at': time.time(),
+        'state': state
+    }
+    temp_path = f"{path}.tmp"
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+def load_snapshot(path: str, storage_name: str, max_age: float) -> Optional[tuple]:
+    """Read a snapshot back, returns (state, age in seconds) or None if it can't be trusted
+
+    A snapshot is only used once: it is deleted after reading, valid or not,
+    so a later crash can't bring back state that has moved on since.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        # gzip checks its CRC on read, so truncated or corrupted files fail here
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable state snapshot: {e}")
+        return None
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    age = time.time() - payload.get('saved_at', 0)
+    if payload.get('version') != SNAPSHOT_VERSION:
+        print("⚠️ Ignoring state snapshot from another bot version")
+        return None
+    if payload.get('storage') != storage_name:
+        print(f"⚠️ Ignoring state snapshot taken with {payload.get('storage')} storage")
+        return None
+    if not 0 <= age <= max_age:
+        print(f"⚠️ Ignoring state snapshot that is {age:.0f}s old")
+        return None
+    return payload.get('state') or {}, age
@@ -0,0 +1,748 @@
+import os
+import json
+import heapq
+import asyncio
+import threading
+from datetime import datetime, date
+from typing import Optional
+
+
+class StorageBackend:
+    """Interface every storage engine implements
+
+    Users are plain dicts shaped like rows of the `users` table (`id`,
+    `discord_id`, `discord_username`, `timezone`, `reminder_time`), check-ins
+    like rows of `checkins` (`date`, `message`, `mood`, `created_at`). Check-in
+    methods take both the user's `id` and `discord_id` so engines can key by
+    whichever they store; for local engines the two are the same.
+    """
+
+    name = 'base'
+
+    def warm_up(self):
+        """Do slow one-off setup (imports, connections) ahead of the first request"""
+        pass
+
+    # Users
+    async def get_or_create_user(self, discord_id: str, username: str) -> dict:
+        raise NotImplementedError
+
+    async def get_user(self, discord_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def update_user(self, discord_id: str, fields: dict) -> bool:
+        raise NotImplementedError
+
+    # Reminders
+    async def get_users_with_reminders(self) -> list:
+        raise NotImplementedError
+
+    # Checkins
+    async def get_checkin(self, user_id: str, discord_id: str, day: date) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def upsert_checkin(self, user_id: str, discord_id: str, day: date, message: str, mood: int,
+                             reminded: bool = False) -> bool:
+        """Create or replace the check-in for `day`; `reminded` marks it as prompted by a reminder"""
+        raise NotImplementedError
+
+    async def bulk_upsert_checkins(self, user_id: str, discord_id: str, checkins: list,
+                                   overwrite: bool = False) -> Optional[int]:
+        """Write a batch of validated check-ins (unique dates), returns rows written or None on failure
+
+        Existing dates are kept unless `overwrite` is set.
+        """
+        raise NotImplementedError
+
+    # Stats
+    async def get_checkin_dates(self, user_id: str, discord_id: str) -> list:
+        """Date strings of all of a user's check-ins, newest first"""
+        raise NotImplementedError
+
+    async def get_checkins_page(self, user_id: str, discord_id: str, before: Optional[date] = None,
+                                limit: int = 10) -> list:
+        """Keyset page of check-ins strictly older than `before`, newest first"""
+        raise NotImplementedError
+
+    async def get_mood_days(self, user_id: str, discord_id: str) -> list:
+        """(date string, mood) pairs for all of a user's check-ins, mood may be None"""
+        raise NotImplementedError
+
+    # Servers
+    async def add_guild_member(self, guild_id: str, discord_id: str) -> bool:
+        raise NotImplementedError
+
+    async def get_guild_members(self, guild_id: str) -> list:
+        """Discord ids of everyone who has used the bot in a server, raises on failure"""
+        raise NotImplementedError
+
+    # Bulk reads - these raise when the engine fails: an empty or fallback answer
+    # would look like real data (wiped leaderboards, reminders to everyone)
+    async def get_day_ordinals(self, discord_ids: list) -> dict:
+        """Map discord id -> list of check-in dates as `date.toordinal()` ints"""
+        raise NotImplementedError
+
+    async def get_user_timezones(self) -> dict:
+        """Map discord id -> timezone name for every user outside UTC"""
+        raise NotImplementedError
+
+    async def get_checked_in(self, user_ids: dict, day: date) -> set:
+        """Discord ids of the users (user id -> discord id) who checked in on `day`"""
+        raise NotImplementedError
+
+    # Community rollups
+    async def record_reminders_sent(self, day: date, count: int) -> bool:
+        """Add `count` reminders sent on `day` to the daily rollup"""
+        raise NotImplementedError
+
+    async def get_daily_rollups(self, since: date, until: date) -> list:
+        """Rollup rows for days in [since, until], oldest first, days without activity omitted
+
+        Rows look like `daily_rollups`: `date`, `checkins`, `mood_sum`,
+        `mood_histogram` (counts for moods 1-5), `reminder_checkins` and
+        `reminders_sent`.
+        """
+        raise NotImplementedError
+
+
+def _new_rollup(date_str: str) -> dict:
+    return {
+        'date': date_str,
+        'checkins': 0,
+        'mood_sum': 0,
+        'mood_histogram': [0, 0, 0, 0, 0],
+        'reminder_checkins': 0,
+        'reminders_sent': 0,
+    }
+
+
+def _adjust_rollup(rollups: dict, checkin: dict, sign: int):
+    """Add (sign 1) or remove (sign -1) one check-in from its day's rollup, like the SQL trigger"""
+    rollup = rollups.setdefault(checkin['date'], _new_rollup(checkin['date']))
+    rollup['checkins'] += sign
+    mood = checkin.get('mood')
+    if mood:
+        rollup['mood_sum'] += sign * mood
+        rollup['mood_histogram'][mood - 1] += sign
+    if checkin.get('reminded'):
+        rollup['reminder_checkins'] += sign
+
+
+def _rollups_between(rollups: dict, since: date, until: date) -> list:
+    start, end = since.isoformat(), until.isoformat()
+    return [dict(rollups[d]) for d in sorted(rollups) if start <= d <= end]
+
+
+def _new_local_user(discord_id: str, username: str) -> dict:
+    return {
+        'id': discord_id,
+        'discord_id': discord_id,
+        'discord_username': username,
+        'timezone': None,
+        'reminder_time': None,
+    }
+
+
+class MemoryBackend(StorageBackend):
+    """Pure in-memory engine - zero I/O, nothing survives a restart"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.users = {}     # discord_id -> user
+        self.checkins = {}  # discord_id -> {date string: checkin}
+        self.guild_members = {}  # guild_id -> set of discord_ids
+        self.rollups = {}   # date string -> daily rollup
+
+    def _checkins_for(self, discord_id: str) -> dict:
+        return self.checkins.setdefault(discord_id, {})
+
+    async def get_or_create_user(self, discord_id: str, username: str) -> dict:
+        user = self.users.get(discord_id)
+        if user is None:
+            user = self.users[discord_id] = _new_local_user(discord_id, username)
+        return dict(user)
+
+    async def get_user(self, discord_id: str) -> Optional[dict]:
+        user = self.users.get(discord_id)
+        return dict(user) if user else None
+
+    async def update_user(self, discord_id: str, fields: dict) -> bool:
+        user = self.users.get(discord_id)
+        if user is None:
+            return False
+        user.update(fields)
+        return True
+
+    async def get_users_with_reminders(self) -> list:
+        return [dict(u) for u in self.users.values() if u.get('reminder_time')]
+
+    async def get_checkin(self, user_id: str, discord_id: str, day: date) -> Optional[dict]:
+        checkin = self._checkins_for(discord_id).get(day.isoformat())
+        return dict(checkin) if checkin else None
+
+    async def upsert_checkin(self, user_id: str, discord_id: str, day: date, message: str, mood: int,
+                             reminded: bool = False) -> bool:
+        date_str = day.isoformat()
+        checkins = self._checkins_for(discord_id)
+        if date_str in checkins:
+            existing = checkins[date_str]
+            _adjust_rollup(self.rollups, existing, -1)
+            existing.update({
+                'message': message,
+                'mood': mood,
+                'reminded': existing.get('reminded') or reminded,
+                'updated_at': datetime.now().isoformat()
+            })
+        else:
+            checkins[date_str] = {
+                'date': date_str,
+                'message': message,
+                'mood': mood,
+                'reminded': reminded,
+                'created_at': datetime.now().isoformat()
+            }
+        _adjust_rollup(self.rollups, checkins[date_str], 1)
+        return True
+
+    async def bulk_upsert_checkins(self, user_id: str, discord_id: str, checkins: list,
+                                   overwrite: bool = False) -> Optional[int]:
+        existing = self._checkins_for(discord_id)
+        written = 0
+        for checkin in checkins:
+            if checkin['date'] in existing:
+                if not overwrite:
+                    continue
+                _adjust_rollup(self.rollups, existing[checkin['date']], -1)
+            existing[checkin['date']] = dict(checkin, created_at=datetime.now().isoformat())
+            _adjust_rollup(self.rollups, existing[checkin['date']], 1)
+            written += 1
+        return written
+
+    async def get_checkin_dates(self, user_id: str, discord_id: str) -> list:
+        return sorted(self._checkins_for(discord_id), reverse=True)
+
+    async def get_checkins_page(self, user_id: str, discord_id: str, before: Optional[date] = None,
+                                limit: int = 10) -> list:
+        checkins = self._checkins_for(discord_id)
+        cursor = before.isoformat() if before else None
+        dates = (d for d in checkins if cursor is None or d < cursor)
+        return [dict(checkins[d]) for d in heapq.nlargest(limit, dates)]
+
+    async def get_mood_days(self, user_id: str, discord_id: str) -> list:
+        return [(d, c.get('mood')) for d, c in self._checkins_for(discord_id).items()]
+
+    async def add_guild_member(self, guild_id: str, discord_id: str) -> bool:
+        self.guild_members.setdefault(guild_id, set()).add(discord_id)
+        return True
+
+    async def get_guild_members(self, guild_id: str) -> list:
+        return list(self.guild_members.get(guild_id, ()))
+
+    async def get_day_ordinals(self, discord_ids: list) -> dict:
+        return {
+            discord_id: [date.fromisoformat(d).toordinal() for d in self._checkins_for(discord_id)]
+            for discord_id in discord_ids
+        }
+
+    async def get_user_timezones(self) -> dict:
+        return {d: u['timezone'] for d, u in self.users.items() if u.get('timezone') not in (None, 'UTC')}
+
+    async def get_checked_in(self, user_ids: dict, day: date) -> set:
+        date_str = day.isoformat()
+        return {d for d in user_ids.values() if date_str in self._checkins_for(d)}
+
+    async def record_reminders_sent(self, day: date, count: int) -> bool:
+        date_str = day.isoformat()
+        self.rollups.setdefault(date_str, _new_rollup(date_str))['reminders_sent'] += count
+        return True
+
+    async def get_daily_rollups(self, since: date, until: date) -> list:
+        return _rollups_between(self.rollups, since, until)
+
+
+class LocalJSONBackend(StorageBackend):
+    """Durable local engine - check-ins in checkins.json, user settings in users.json,
+    community rollups in rollups.json"""
+
+    name = 'local'
+
+    def __init__(self, checkins_file: str = 'checkins.json', users_file: str = 'users.json',
+                 rollups_file: str = 'rollups.json'):
+        self.local_file = checkins_file
+        self.users_file = users_file
+        self.rollups_file = rollups_file
+
+    def _load(self, path: str) -> dict:
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def _save(self, path: str, data: dict):
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    async def get_or_create_user(self, discord_id: str, username: str) -> dict:
+        try:
+            users = self._load(self.users_file)
+            if discord_id not in users:
+                users[discord_id] = _new_local_user(discord_id, username)
+                self._save(self.users_file, users)
+            return users[discord_id]
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return _new_local_user(discord_id, username)
+
+    async def get_user(self, discord_id: str) -> Optional[dict]:
+        try:
+            return self._load(self.users_file).get(discord_id)
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return None
+
+    async def update_user(self, discord_id: str, fields: dict) -> bool:
+        try:
+            users = self._load(self.users_file)
+            if discord_id not in users:
+                return False
+            users[discord_id].update(fields)
+            self._save(self.users_file, users)
+            return True
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return False
+
+    async def get_users_with_reminders(self) -> list:
+        try:
+            return [u for u in self._load(self.users_file).values() if u.get('reminder_time')]
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return []
+
+    async def get_checkin(self, user_id: str, discord_id: str, day: date) -> Optional[dict]:
+        try:
+            date_str = day.isoformat()
+            checkins = self._load(self.local_file).get(discord_id, [])
+            return next((c for c in checkins if c['date'] == date_str), None)
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return None
+
+    async def upsert_checkin(self, user_id: str, discord_id: str, day: date, message: str, mood: int,
+                             reminded: bool = False) -> bool:
+        try:
+            data = self._load(self.local_file)
+            rollups = self._load(self.rollups_file)
+            checkins = data.setdefault(discord_id, [])
+
+            date_str = day.isoformat()
+            existing = next((c for c in checkins if c['date'] == date_str), None)
+            if existing:
+                _adjust_rollup(rollups, existing, -1)
+                existing['message'] = message
+                existing['mood'] = mood
+                existing['reminded'] = existing.get('reminded') or reminded
+                existing['updated_at'] = datetime.now().isoformat()
+            else:
+                existing = {
+                    'date': date_str,
+                    'message': message,
+                    'mood': mood,
+                    'reminded': reminded,
+                    'created_at': datetime.now().isoformat()
+                }
+                checkins.append(existing)
+            _adjust_rollup(rollups, existing, 1)
+
+            self._save(self.local_file, data)
+            self._save(self.rollups_file, rollups)
+            return True
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return False
+
+    async def bulk_upsert_checkins(self, user_id: str, discord_id: str, checkins: list,
+                                   overwrite: bool = False) -> Optional[int]:
+        try:
+            # One load and one save per batch, not per row
+            data = self._load(self.local_file)
+            rollups = self._load(self.rollups_file)
+            existing = {c['date']: c for c in data.get(discord_id, [])}
+            written = 0
+            for checkin in checkins:
+                if checkin['date'] in existing:
+                    if not overwrite:
+                        continue
+                    _adjust_rollup(rollups, existing[checkin['date']], -1)
+                existing[checkin['date']] = dict(checkin, created_at=datetime.now().isoformat())
+                _adjust_rollup(rollups, existing[checkin['date']], 1)
+                written += 1
+
+            data[discord_id] = list(existing.values())
+            self._save(self.local_file, data)
+            self._save(self.rollups_file, rollups)
+            return written
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return None
+
+    async def get_checkin_dates(self, user_id: str, discord_id: str) -> list:
+        try:
+            checkins = self._load(self.local_file).get(discord_id, [])
+            return sorted((c['date'] for c in checkins), reverse=True)
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return []
+
+    async def get_checkins_page(self, user_id: str, discord_id: str, before: Optional[date] = None,
+                                limit: int = 10) -> list:
+        try:
+            checkins = self._load(self.local_file).get(discord_id, [])
+            cursor = before.isoformat() if before else None
+            older = (c for c in checkins if cursor is None or c['date'] < cursor)
+            return heapq.nlargest(limit, older, key=lambda x: x['date'])
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return []
+
+    async def get_mood_days(self, user_id: str, discord_id: str) -> list:
+        try:
+            return [(c['date'], c.get('mood')) for c in self._load(self.local_file).get(discord_id, [])]
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return []
+
+    async def add_guild_member(self, guild_id: str, discord_id: str) -> bool:
+        try:
+            users = self._load(self.users_file)
+            if discord_id not in users:
+                return False
+            guild_ids = users[discord_id].setdefault('guild_ids', [])
+            if guild_id not in guild_ids:
+                guild_ids.append(guild_id)
+                self._save(self.users_file, users)
+            return True
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return False
+
+    async def get_guild_members(self, guild_id: str) -> list:
+        users = self._load(self.users_file)
+        return [d for d, u in users.items() if guild_id in u.get('guild_ids', [])]
+
+    async def get_day_ordinals(self, discord_ids: list) -> dict:
+        data = self._load(self.local_file)
+        return {
+            discord_id: [date.fromisoformat(c['date']).toordinal() for c in data.get(discord_id, [])]
+            for discord_id in discord_ids
+        }
+
+    async def get_user_timezones(self) -> dict:
+        users = self._load(self.users_file)
+        return {d: u['timezone'] for d, u in users.items() if u.get('timezone') not in (None, 'UTC')}
+
+    async def get_checked_in(self, user_ids: dict, day: date) -> set:
+        data = self._load(self.local_file)
+        date_str = day.isoformat()
+        return {d for d in user_ids.values() if any(c['date'] == date_str for c in data.get(d, []))}
+
+    async def record_reminders_sent(self, day: date, count: int) -> bool:
+        try:
+            rollups = self._load(self.rollups_file)
+            date_str = day.isoformat()
+            rollups.setdefault(date_str, _new_rollup(date_str))['reminders_sent'] += count
+            self._save(self.rollups_file, rollups)
+            return True
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return False
+
+    async def get_daily_rollups(self, since: date, until: date) -> list:
+        try:
+            return _rollups_between(self._load(self.rollups_file), since, until)
+        except Exception as e:
+            print(f"Local storage error: {e}")
+            return []
+
+
+class SupabaseBackend(StorageBackend):
+    """Supabase engine - falls back to another engine when the database errors
+
+    Pass either a ready `client` or a `connect` callable that builds one; the
+    latter runs on first use so the heavy supabase import stays out of startup.
+    """
+
+    name = 'supabase'
+    PAGE_SIZE = 1000  # PostgREST's default max rows per request
+    ORDINALS_CHUNK = 200  # users per bulk call (get_checkin_day_ordinals, in_() filters)
+
+    def __init__(self, client=None, fallback: StorageBackend = None, connect=None):
+        self._client = client
+        self._connect = connect
+        self._connect_lock = threading.Lock()
+        self.fallback = fallback or LocalJSONBackend()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._connect_lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    def warm_up(self):
+        self.client
+
+    async def get_or_create_user(self, discord_id: str, username: str) -> dict:
+        try:
+            # Try to get existing user
+            result = self.client.table('users').select('*').eq('discord_id', discord_id).execute()
+            if result.data:
+                return result.data[0]
+
+            # Use rpc call to bypass RLS for user creation
+            result = self.client.rpc('create_user_if_not_exists', {
+                'p_discord_id': discord_id,
+                'p_discord_username': username
+            }).execute()
+
+            if result.data:
+                return result.data[0] if isinstance(result.data, list) else result.data
+
+            # Fallback: try direct insert
+            result = self.client.table('users').insert({
+                'discord_id': discord_id,
+                'discord_username': username
+            }).execute()
+            return result.data[0]
+
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_or_create_user(discord_id, username)
+
+    async def get_user(self, discord_id: str) -> Optional[dict]:
+        try:
+            result = self.client.table('users').select('*').eq('discord_id', discord_id).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_user(discord_id)
+
+    async def update_user(self, discord_id: str, fields: dict) -> bool:
+        try:
+            self.client.table('users').update(fields).eq('discord_id', discord_id).execute()
+            return True
+        except Exception as e:
+            print(f"Database error updating user: {e}")
+            return False
+
+    async def get_users_with_reminders(self) -> list:
+        try:
+            result = self.client.table('users').select('*').not_.is_('reminder_time', 'null').execute()
+            return result.data
+        except Exception as e:
+            print(f"Database error: {e}")
+            return []
+
+    async def get_checkin(self, user_id: str, discord_id: str, day: date) -> Optional[dict]:
+        try:
+            result = self.client.table('checkins').select('*').eq('user_id', user_id).eq('date', day.isoformat()).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_checkin(user_id, discord_id, day)
+
+    async def upsert_checkin(self, user_id: str, discord_id: str, day: date, message: str, mood: int,
+                             reminded: bool = False) -> bool:
+        try:
+            # Use RPC function for checkin creation to handle RLS properly
+            result = self.client.rpc('create_or_update_checkin', {
+                'p_user_discord_id': discord_id,
+                'p_date': day.isoformat(),
+                'p_message': message,
+                'p_mood': mood,
+                'p_reminded': reminded
+            }).execute()
+            return result.data is not None
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.upsert_checkin(user_id, discord_id, day, message, mood, reminded)
+
+    async def bulk_upsert_checkins(self, user_id: str, discord_id: str, checkins: list,
+                                   overwrite: bool = False) -> Optional[int]:
+        # No local fallback here - half an import in each store is worse than a clean failure
+        try:
+            result = self.client.rpc('bulk_upsert_checkins', {
+                'p_user_discord_id': discord_id,
+                'p_checkins': checkins,
+                'p_overwrite': overwrite
+            }).execute()
+            return result.data if isinstance(result.data, int) else len(checkins)
+        except Exception as e:
+            print(f"Database error during bulk import: {e}")
+            return None
+
+    async def get_checkin_dates(self, user_id: str, discord_id: str) -> list:
+        try:
+            # Keyset-paged like get_mood_days, a single select stops at the row cap
+            dates = []
+            cursor = None
+            while True:
+                query = self.client.table('checkins').select('date').eq('user_id', user_id)
+                if cursor:
+                    query = query.lt('date', cursor)
+                result = query.order('date', desc=True).limit(self.PAGE_SIZE).execute()
+                dates.extend(c['date'] for c in result.data)
+                if len(result.data) < self.PAGE_SIZE:
+                    return dates
+                cursor = dates[-1]
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_checkin_dates(user_id, discord_id)
+
+    async def get_checkins_page(self, user_id: str, discord_id: str, before: Optional[date] = None,
+                                limit: int = 10) -> list:
+        try:
+            # Served by idx_checkins_user_date, no OFFSET scans however deep the page
+            query = self.client.table('checkins').select('*').eq('user_id', user_id)
+            if before:
+                query = query.lt('date', before.isoformat())
+            result = query.order('date', desc=True).limit(limit).execute()
+            return result.data
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_checkins_page(user_id, discord_id, before, limit)
+
+    async def get_mood_days(self, user_id: str, discord_id: str) -> list:
+        try:
+            # Keyset-paged on date, long imported histories go past the row cap
+            days = []
+            cursor = None
+            while True:
+                query = self.client.table('checkins').select('date,mood').eq('user_id', user_id)
+                if cursor:
+                    query = query.gt('date', cursor)
+                result = query.order('date').limit(self.PAGE_SIZE).execute()
+                days.extend((c['date'], c['mood']) for c in result.data)
+                if len(result.data) < self.PAGE_SIZE:
+                    return days
+                cursor = result.data[-1]['date']
+        except Exception as e:
+            print(f"Database error: {e}")
+            return await self.fallback.get_mood_days(user_id, discord_id)
+
+    async def add_guild_member(self, guild_id: str, discord_id: str) -> bool:
+        try:
+            self.client.table('guild_members').upsert(
+                {'guild_id': guild_id, 'discord_id': discord_id},
+                ignore_duplicates=True
+            ).execute()
+            return True
+        except Exception as e:
+            print(f"Database error recording server member: {e}")
+            return False
+
+    # Bulk reads below page through many round trips, so they run in a worker
+    # thread instead of blocking the event loop for the whole scan
+
+    async def get_guild_members(self, guild_id: str) -> list:
+        return await asyncio.to_thread(self._fetch_guild_members, guild_id)
+
+    def _fetch_guild_members(self, guild_id: str) -> list:
+        members = []
+        cursor = ''
+        while True:
+            result = (self.client.table('guild_members').select('discord_id')
+                      .eq('guild_id', guild_id).gt('discord_id', cursor)
+                      .order('discord_id').limit(self.PAGE_SIZE).execute())
+            members.extend(row['discord_id'] for row in result.data)
+            if len(result.data) < self.PAGE_SIZE:
+                return members
+            cursor = members[-1]
+
+    async def get_day_ordinals(self, discord_ids: list) -> dict:
+        return await asyncio.to_thread(self._fetch_day_ordinals, discord_ids)
+
+    def _fetch_day_ordinals(self, discord_ids: list) -> dict:
+        # One row per user with the dates pre-aggregated, so the row cap is never hit
+        ordinals = {}
+        for i in range(0, len(discord_ids), self.ORDINALS_CHUNK):
+            result = self.client.rpc('get_checkin_day_ordinals', {
+                'p_discord_ids': discord_ids[i:i + self.ORDINALS_CHUNK]
+            }).execute()
+            for row in result.data:
+                ordinals[row['discord_id']] = row['days'] or []
+        return ordinals
+
+    async def get_user_timezones(self) -> dict:
+        return await asyncio.to_thread(self._fetch_user_timezones)
+
+    def _fetch_user_timezones(self) -> dict:
+        # NULL and UTC both mean the default zone, so only the rest is fetched
+        timezones = {}
+        cursor = ''
+        while True:
+            result = (self.client.table('users').select('discord_id,timezone')
+                      .neq('timezone', 'UTC').gt('discord_id', cursor)
+                      .order('discord_id').limit(self.PAGE_SIZE).execute())
+            timezones.update((row['discord_id'], row['timezone']) for row in result.data)
+            if len(result.data) < self.PAGE_SIZE:
+                return timezones
+            cursor = result.data[-1]['discord_id']
+
+    async def get_checked_in(self, user_ids: dict, day: date) -> set:
+        checked_in = set()
+        ids = list(user_ids)
+        for i in range(0, len(ids), self.ORDINALS_CHUNK):
+            result = (self.client.table('checkins').select('user_id').eq('date', day.isoformat())
+                      .in_('user_id', ids[i:i + self.ORDINALS_CHUNK]).execute())
+            checked_in.update(user_ids[row['user_id']] for row in result.data)
+        return checked_in
+
+    # Rollups have no local fallback - mixing two partial sets of counts would be misleading
+    async def record_reminders_sent(self, day: date, count: int) -> bool:
+        try:
+            self.client.rpc('record_reminders_sent', {'p_date': day.isoformat(), 'p_count': count}).execute()
+            return True
+        except Exception as e:
+            print(f"Database error recording reminders: {e}")
+            return False
+
+    async def get_daily_rollups(self, since: date, until: date) -> list:
+        try:
+            # One row per day, maintained by a trigger on checkins - never scans checkins
+            query = self.client.table('daily_rollups').select('*').gte('date', since.isoformat())
+            result = query.lte('date', until.isoformat()).order('date').execute()
+            return result.data
+        except Exception as e:
+            print(f"Database error: {e}")
+            return []
+
+
+def create_backend(name: str = None, supabase_url: str = None, supabase_key: str = None) -> StorageBackend:
+    """Build the storage engine selected at startup
+
+    `name` is one of 'supabase', 'local' or 'memory'. When it isn't given,
+    Supabase is used if credentials are configured, local JSON otherwise.
+    """
+    if not name:
+        name = 'supabase' if supabase_url and supabase_key else 'local'
+    name = name.lower()
+
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'local':
+        return LocalJSONBackend()
+    if name == 'supabase':
+        if not (supabase_url and supabase_key):
+            print("⚠️ Supabase selected but SUPABASE_URL/SUPABASE_SERVICE_ROLE are missing, using local JSON")
+            return LocalJSONBackend()
+
+        def connect():
+            from supabase import create_client
+            return create_client(supabase_url, supabase_key)
+
+        return SupabaseBackend(connect=connect)
+
+    raise ValueError(f"Unknown storage backend: {name}")
@@ -0,0 +1,155 @@
+from datetime import datetime
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+
+CONSISTENCY_WINDOW = 30
+LEADERBOARD_METRICS = ('current', 'best', 'consistency')
+
+
+def bulk_streaks(user_codes: np.ndarray, days: np.ndarray, n_users: int, today,
+                 window: int = CONSISTENCY_WINDOW) -> dict:
+    """Compute streaks for every user in one vectorized pass
+
+    `user_codes` and `days` are parallel arrays of (user, day ordinal) pairs in
+    any order, duplicates allowed. `today` is a day ordinal, either one for
+    everybody or an array holding each user's local today. Returns arrays
+    indexed by user code: `current` and `best` streak lengths,
+    `consistency`, the percentage of the last `window` days checked in, and
+    `last_day`, the ordinal of each user's latest check-in (0 if none).
+    """
+    today = np.broadcast_to(np.asarray(today, dtype=np.int64), (n_users,))
+    current = np.zeros(n_users, dtype=np.int64)
+    best = np.zeros(n_users, dtype=np.int64)
+    consistency = np.zeros(n_users, dtype=np.float64)
+    last_day = np.zeros(n_users, dtype=np.int64)
+    if len(days) == 0:
+        return {'current': current, 'best': best, 'consistency': consistency, 'last_day': last_day}
+
+    # Sort (user, day) pairs as one packed int64 key (several times faster than
+    # lexsort) and drop duplicate pairs
+    first_day = days.min()
+    keys = np.sort((user_codes.astype(np.int64) << 32) | (days - first_day))
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = keys[1:] != keys[:-1]
+    keys = keys[unique]
+    users = keys >> 32
+    days = (keys & 0xFFFFFFFF) + first_day
+
+    # Run-length encode: a run starts at a new user or after a gap of more than a day
+    run_start = np.ones(len(days), dtype=bool)
+    run_start[1:] = (users[1:] != users[:-1]) | (np.diff(days) != 1)
+    starts = np.flatnonzero(run_start)
+    ends = np.append(starts[1:], len(days)) - 1
+    run_users = users[starts]
+    run_lengths = ends - starts + 1
+    run_last_day = days[ends]
+
+    # Runs are grouped by user, so each user's best is a segmented max
+    first_run = np.ones(len(starts), dtype=bool)
+    first_run[1:] = run_users[1:] != run_users[:-1]
+    first_runs = np.flatnonzero(first_run)
+    best[run_users[first_runs]] = np.maximum.reduceat(run_lengths, first_runs)
+
+    # A user's last run is their current streak if it reaches today or yesterday
+    last_run = np.append(first_run[1:], True)
+    last_day[run_users[last_run]] = run_last_day[last_run]
+    alive = last_run & (run_last_day >= today[run_users] - 1)
+    current[run_users[alive]] = run_lengths[alive]
+
+    user_today = today[users]
+    in_window = (days > user_today - window) & (days <= user_today)
+    consistency = np.bincount(users[in_window], minlength=n_users) * (100.0 / window)
+
+    return {'current': current, 'best': best, 'consistency': consistency, 'last_day': last_day}
+
+
+class LeaderboardIndex:
+    """Per-server top-k rankings, rebuilt periodically from a bulk streak pass
+
+    Requests only read the precomputed top-k lists, they never touch storage.
+    Between rebuilds, `expire_streaks` zeroes streaks that broke at midnight.
+    """
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self.boards = {}    # guild_id -> {metric: [(discord_id, value), ...]}
+        self.user_codes = {}  # discord_id -> index into the result arrays
+        self.discord_ids = []
+        self.member_codes = {}  # guild_id -> array of member user codes
+        self.results = None
+        self.refreshed_at: Optional[datetime] = None
+
+    def rebuild(self, guild_members: dict, days_by_user: dict, today):
+        """Recompute every board
+
+        `guild_members` maps guild id to member discord ids, `days_by_user`
+        maps discord id to a list of day ordinals. `today` is a day ordinal or
+        a callable returning one per discord id.
+        """
+        discord_ids = list(days_by_user)
+        lengths = np.fromiter((len(days_by_user[d]) for d in discord_ids), dtype=np.int64, count=len(discord_ids))
+        user_codes = np.repeat(np.arange(len(discord_ids), dtype=np.int64), lengths)
+        days = np.fromiter(chain.from_iterable(days_by_user[d] for d in discord_ids),
+                           dtype=np.int64, count=int(lengths.sum()))
+        if callable(today):
+            today = np.fromiter((today(d) for d in discord_ids), dtype=np.int64, count=len(discord_ids))
+
+        results = bulk_streaks(user_codes, days, len(discord_ids), today)
+        codes = {d: i for i, d in enumerate(discord_ids)}
+
+        boards = {}
+        member_codes = {}
+        for guild_id, members in guild_members.items():
+            member_codes[guild_id] = np.fromiter((codes[m] for m in members if m in codes), dtype=np.int64)
+            boards[guild_id] = {
+                metric: self._top_k(member_codes[guild_id], results[metric], discord_ids)
+                for metric in LEADERBOARD_METRICS
+            }
+
+        # Swap everything in at once so readers never see a half-built index
+        self.boards, self.user_codes, self.results = boards, codes, results
+        self.discord_ids, self.member_codes = discord_ids, member_codes
+        self.refreshed_at = datetime.utcnow()
+
+    def expire_streaks(self, discord_ids, today: int) -> int:
+        """Zero the current streak of users whose last check-in is before yesterday
+
+        Meant for the users of one timezone right after its midnight, with
+        `today` their new local day ordinal. Boards are re-ranked only when a
+        streak actually broke. Returns how many streaks expired.
+        """
+        if self.results is None:
+            return 0
+        codes = np.fromiter((self.user_codes[d] for d in discord_ids if d in self.user_codes), dtype=np.int64)
+        current = self.results['current']
+        broken = codes[(current[codes] > 0) & (self.results['last_day'][codes] < today - 1)]
+        if len(broken) == 0:
+            return 0
+
+        current[broken] = 0
+        for guild_id, member_codes in self.member_codes.items():
+            self.boards[guild_id]['current'] = self._top_k(member_codes, current, self.discord_ids)
+        return len(broken)
+
+    def _top_k(self, member_codes: np.ndarray, values: np.ndarray, discord_ids: list) -> list:
+        if len(member_codes) == 0:
+            return []
+        member_values = values[member_codes]
+        k = min(self.k, len(member_codes))
+        top = np.argpartition(-member_values, k - 1)[:k]
+        top = top[np.argsort(-member_values[top], kind='stable')]
+        return [(discord_ids[member_codes[i]], member_values[i].item()) for i in top if member_values[i] > 0]
+
+    def top(self, guild_id: str, metric: str) -> Optional[list]:
+        """Top-k (discord_id, value) pairs for a server, None if it hasn't been ranked yet"""
+        board = self.boards.get(guild_id)
+        return board[metric] if board else None
+
+    def user_entry(self, discord_id: str) -> Optional[dict]:
+        """The user's own numbers from the last rebuild"""
+        code = self.user_codes.get(discord_id)
+        if code is None:
+            return None
+        return {metric: self.results[metric][code].item() for metric in LEADERBOARD_METRICS}
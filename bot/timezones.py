@@ -0,0 +1,99 @@
+from datetime import datetime, date
+from typing import Optional
+
+import pytz
+
+DEFAULT_ZONE = 'UTC'
+
+
+class TimezoneIndex:
+    """Users grouped by timezone, so "today" is worked out once per zone
+
+    `zones` maps zone name -> set of discord ids. Users without a zone are
+    treated as UTC once the index has been `load`ed; before that, `zone_of`
+    returns None for them so callers can fall back to a lookup.
+    """
+
+    def __init__(self):
+        self.zones = {}      # zone name -> set of discord_ids
+        self.user_zones = {}  # discord_id -> zone name
+        self.loaded = False
+        self.last_dates = {}  # zone name -> local date at the last sweep
+
+    def set_zone(self, discord_id: str, zone: Optional[str]):
+        """Move a user into `zone` (None means the UTC default)"""
+        zone = zone or DEFAULT_ZONE
+        previous = self.user_zones.get(discord_id)
+        if previous == zone:
+            return
+        if previous is not None:
+            self.zones[previous].discard(discord_id)
+            if not self.zones[previous]:
+                del self.zones[previous]
+        self.zones.setdefault(zone, set()).add(discord_id)
+        self.user_zones[discord_id] = zone
+
+    def load(self, user_zones: dict, keep=()):
+        """Bulk-fill from discord_id -> zone name; users missing from it are UTC from now on
+
+        Users in `keep` were updated after `user_zones` was read and keep their zone.
+        """
+        for discord_id in list(self.user_zones):
+            if discord_id not in user_zones and discord_id not in keep:
+                self.set_zone(discord_id, None)
+        for discord_id, zone in user_zones.items():
+            if discord_id not in keep:
+                self.set_zone(discord_id, zone)
+        self.loaded = True
+
+    def zone_of(self, discord_id: str) -> Optional[str]:
+        zone = self.user_zones.get(discord_id)
+        if zone is None and self.loaded:
+            return DEFAULT_ZONE
+        return zone
+
+    @staticmethod
+    def local_date(zone: str, now: Optional[datetime] = None) -> date:
+        """Current date in `zone`; `now` is an aware datetime (defaults to the current time)"""
+        now = now or datetime.now(pytz.UTC)
+        try:
+            return now.astimezone(pytz.timezone(zone)).date()
+        except pytz.UnknownTimeZoneError:
+            return now.astimezone(pytz.UTC).date()
+
+    def local_dates(self, now: Optional[datetime] = None) -> dict:
+        """Local date of every zone with users, one conversion per zone"""
+        now = now or datetime.now(pytz.UTC)
+        dates = {zone: self.local_date(zone, now) for zone in self.zones}
+        dates.setdefault(DEFAULT_ZONE, self.local_date(DEFAULT_ZONE, now))
+        return dates
+
+    def today_for(self, discord_id: str, dates: Optional[dict] = None) -> Optional[date]:
+        """A user's local date, from precomputed `local_dates()` when given; None if their zone isn't known"""
+        zone = self.zone_of(discord_id)
+        if zone is None:
+            return None
+        if dates is not None and zone in dates:
+            return dates[zone]
+        return self.local_date(zone)
+
+    def group(self, discord_ids) -> dict:
+        """Split discord ids by zone, unknown users fall under the UTC default"""
+        groups = {}
+        for discord_id in discord_ids:
+            groups.setdefault(self.zone_of(discord_id) or DEFAULT_ZONE, []).append(discord_id)
+        return groups
+
+    def advance(self, now: Optional[datetime] = None) -> list:
+        """(zone, new local date) for every zone whose midnight has passed since the last call
+
+        The first call only records the current dates, zones added since the
+        last call are recorded without being reported.
+        """
+        rolled = []
+        for zone, today in self.local_dates(now).items():
+            previous = self.last_dates.get(zone)
+            if previous is not None and today > previous:
+                rolled.append((zone, today))
+            self.last_dates[zone] = today
+        return rolled
@@ -0,0 +1,10 @@
+#!/bin/sh
+# Volumes (fly.io's /data) are mounted owned by root - hand them to the app user,
+# then drop root. exec keeps the bot as PID 1 so it gets SIGTERM directly
+if [ "$(id -u)" = "0" ]; then
+    if [ -d /data ]; then
+        chown app:app /data
+    fi
+    exec setpriv --reuid=app --regid=app --init-groups "$@"
+fi
+exec "$@"
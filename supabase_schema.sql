@@ -16,13 +16,39 @@ create table if not exists checkins (
   date date not null,
   message text,
   mood integer check (mood >= 1 and mood <= 5),
+  reminded boolean not null default false, -- logged after the bot sent that day's reminder
   created_at timestamp default now(),
   unique(user_id, date)
 );
 
+-- Added after launch, for databases created before the column existed
+alter table checkins add column if not exists reminded boolean not null default false;
+
+-- Which servers each user has used the bot in (for per-server leaderboards)
+create table if not exists guild_members (
+  guild_id text not null,
+  discord_id text not null references users(discord_id) on delete cascade,
+  created_at timestamp default now(),
+  primary key (guild_id, discord_id)
+);
+
+-- One row per day of community-wide activity, kept up to date by the
+-- checkins_daily_rollups trigger so aggregate stats never scan checkins
+create table if not exists daily_rollups (
+  date date primary key,
+  checkins integer not null default 0,
+  mood_sum integer not null default 0,
+  mood_histogram integer[] not null default '{0,0,0,0,0}', -- check-ins per mood 1-5
+  reminder_checkins integer not null default 0,
+  reminders_sent integer not null default 0,
+  updated_at timestamp default now()
+);
+
 -- Row Level Security
 alter table users enable row level security;
 alter table checkins enable row level security;
+alter table guild_members enable row level security;
+alter table daily_rollups enable row level security;
 
 -- Users can only see their own data
 do $$ begin
@@ -137,11 +163,14 @@ end;
 $$;
 
 -- Function to create or update checkin (bypasses RLS for bot usage)
+-- The old 4-argument version would make PostgREST calls ambiguous
+drop function if exists create_or_update_checkin(text, date, text, integer);
 create or replace function create_or_update_checkin(
   p_user_discord_id text,
   p_date date,
   p_message text default null,
-  p_mood integer default null
+  p_mood integer default null,
+  p_reminded boolean default false
 )
 returns checkins
 language plpgsql
@@ -155,12 +184,13 @@ begin
   select * into user_record from create_user_if_not_exists(p_user_discord_id);
   
   -- Insert or update checkin
-  insert into checkins (user_id, date, message, mood)
-  values (user_record.id, p_date, p_message, p_mood)
+  insert into checkins (user_id, date, message, mood, reminded)
+  values (user_record.id, p_date, p_message, p_mood, p_reminded)
   on conflict (user_id, date)
   do update set 
     message = excluded.message,
     mood = excluded.mood,
+    reminded = checkins.reminded or excluded.reminded,
     created_at = now()
   returning * into result_checkin;
   
@@ -168,6 +198,150 @@ begin
 end;
 $$;
 
+-- Function to bulk import historical checkins in one round trip (bypasses RLS for bot usage)
+-- p_checkins is a JSON array of {date, message, mood} with unique dates
+create or replace function bulk_upsert_checkins(
+  p_user_discord_id text,
+  p_checkins jsonb,
+  p_overwrite boolean default false
+)
+returns integer
+language plpgsql
+security definer
+as $$
+declare
+  user_record users;
+  affected integer;
+begin
+  -- Get or create user first
+  select * into user_record from create_user_if_not_exists(p_user_discord_id);
+  
+  if p_overwrite then
+    insert into checkins (user_id, date, message, mood)
+    select user_record.id, c.date, c.message, c.mood
+    from jsonb_to_recordset(p_checkins) as c(date date, message text, mood integer)
+    on conflict (user_id, date)
+    do update set
+      message = excluded.message,
+      mood = excluded.mood;
+  else
+    -- Keep whatever the user already logged for a date
+    insert into checkins (user_id, date, message, mood)
+    select user_record.id, c.date, c.message, c.mood
+    from jsonb_to_recordset(p_checkins) as c(date date, message text, mood integer)
+    on conflict (user_id, date) do nothing;
+  end if;
+  
+  get diagnostics affected = row_count;
+  return affected;
+end;
+$$;
+
+-- Function to load check-in dates for many users at once (leaderboards)
+-- Dates come back as Python-style day ordinals (date.toordinal()), one row per user
+create or replace function get_checkin_day_ordinals(p_discord_ids text[])
+returns table (discord_id text, days integer[])
+language sql
+stable
+security definer
+as $$
+  select u.discord_id, array_agg((c.date - date '0001-01-01') + 1 order by c.date)
+  from users u
+  join checkins c on c.user_id = u.id
+  where u.discord_id = any(p_discord_ids)
+  group by u.discord_id;
+$$;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one check-in from its day's rollup
+create or replace function adjust_daily_rollup(
+  p_date date,
+  p_mood integer,
+  p_reminded boolean,
+  p_sign integer
+)
+returns void
+language plpgsql
+security definer
+as $$
+begin
+  insert into daily_rollups (date) values (p_date)
+  on conflict (date) do nothing;
+  
+  update daily_rollups set
+    checkins = checkins + p_sign,
+    mood_sum = mood_sum + coalesce(p_mood, 0) * p_sign,
+    mood_histogram = array(
+      select h + case when i = p_mood then p_sign else 0 end
+      from unnest(mood_histogram) with ordinality as t(h, i)
+      order by i
+    ),
+    reminder_checkins = reminder_checkins + case when p_reminded then p_sign else 0 end,
+    updated_at = now()
+  where date = p_date;
+end;
+$$;
+
+-- Keep daily_rollups in step with every write to checkins (bot RPCs, imports, web app, deletes)
+create or replace function maintain_daily_rollups()
+returns trigger
+language plpgsql
+security definer
+as $$
+begin
+  if tg_op = 'UPDATE' and old.date = new.date and old.mood is not distinct from new.mood
+     and old.reminded = new.reminded then
+    return null; -- only the message changed
+  end if;
+  
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform adjust_daily_rollup(old.date, old.mood, old.reminded, -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform adjust_daily_rollup(new.date, new.mood, new.reminded, 1);
+  end if;
+  return null;
+end;
+$$;
+
+do $$ begin
+  if not exists (select 1 from pg_trigger where tgname = 'checkins_daily_rollups') then
+    -- Backfill days that have check-ins from before the trigger existed
+    insert into daily_rollups (date, checkins, mood_sum, mood_histogram, reminder_checkins)
+    select
+      date,
+      count(*),
+      coalesce(sum(mood), 0),
+      array[
+        count(*) filter (where mood = 1), count(*) filter (where mood = 2), count(*) filter (where mood = 3),
+        count(*) filter (where mood = 4), count(*) filter (where mood = 5)
+      ],
+      count(*) filter (where reminded)
+    from checkins
+    group by date
+    on conflict (date) do nothing;
+    
+    create trigger checkins_daily_rollups
+      after insert or update or delete on checkins
+      for each row
+      execute function maintain_daily_rollups();
+  end if;
+end $$;
+
+-- Function to count reminder DMs sent on a day (reminder conversion rate)
+create or replace function record_reminders_sent(p_date date, p_count integer)
+returns void
+language sql
+security definer
+as $$
+  insert into daily_rollups (date, reminders_sent) values (p_date, p_count)
+  on conflict (date) do update set
+    reminders_sent = daily_rollups.reminders_sent + excluded.reminders_sent,
+    updated_at = now();
+$$;
+
 -- Grant execute permissions to service role
 grant execute on function create_user_if_not_exists(text, text) to service_role;
-grant execute on function create_or_update_checkin(text, date, text, integer) to service_role; 
\ No newline at end of file
+grant execute on function create_or_update_checkin(text, date, text, integer, boolean) to service_role;
+grant execute on function bulk_upsert_checkins(text, jsonb, boolean) to service_role;
+grant execute on function get_checkin_day_ordinals(text[]) to service_role; 
+grant execute on function record_reminders_sent(date, integer) to service_role;
\ No newline at end of file
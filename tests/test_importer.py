@@ -0,0 +1,50 @@
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot'))
+
+import pytest
+
+from importer import CheckinValidator
+
+TODAY = date(2024, 6, 1)
+
+
+def validate(**row):
+    return CheckinValidator(TODAY).validate(row)
+
+
+@pytest.mark.parametrize('mood, expected', [('3', 3), (' 5 ', 5), (1, 1), ('', None), (None, None)])
+def test_accepts_whole_moods(mood, expected):
+    checkin, error = validate(date='2024-01-01', mood=mood)
+    assert error is None
+    assert checkin['mood'] == expected
+
+
+@pytest.mark.parametrize('mood', ['inf', '-inf', 'nan', '3.7', '3.0', '1e3', 'three', True, 3.0])
+def test_rejects_moods_that_are_not_whole_numbers(mood):
+    checkin, error = validate(date='2024-01-01', mood=mood)
+    assert checkin is None
+    assert 'not a whole number' in error
+
+
+@pytest.mark.parametrize('mood', ['0', '6', '-1', '9' * 5000])
+def test_rejects_moods_outside_range(mood):
+    checkin, error = validate(date='2024-01-01', mood=mood)
+    assert checkin is None
+    assert error
+
+
+@pytest.mark.parametrize('day', ['0001-01-01', '1969-12-31', '2024-06-02', 'yesterday', ''])
+def test_rejects_out_of_range_or_invalid_dates(day):
+    checkin, error = validate(date=day)
+    assert checkin is None
+    assert error
+
+
+def test_accepts_boundary_dates_once():
+    validator = CheckinValidator(TODAY)
+    assert validator.validate({'date': '1970-01-01'})[1] is None
+    assert validator.validate({'date': TODAY.isoformat()})[1] is None
+    assert validator.validate({'date': TODAY.isoformat()})[0] is None